@@ -1,14 +1,104 @@
-from flask import Flask, render_template, send_file, request, redirect, url_for
+from flask import Flask, render_template, send_file, request, redirect, url_for, Response, stream_with_context, jsonify, abort
+from werkzeug.security import safe_join
 from forms import FormSelector, FormFactory
-from document_generator import DocumentGeneratorFactory, OutputFormat
+from document_generator import DocumentGeneratorFactory, OutputFormat, render_formats, write_bundle, preload_backends
 from config import FormType, Config
+from schema import get_schema
+from batch import INPUT_FORMATS, BatchRenderer, input_format_for, read_rows, iter_batch, validate_row
+from document_cache import CachedDocument, document_cache
+from document_store import TemplateChangedError, document_store
+from jobs import job_queue, DOCUMENT, BATCH, DONE
+from metrics import metrics
+from profiling import ProfileRun, profiler
 from datetime import datetime
+from urllib.parse import quote
+import hashlib
 import os
 import zipfile
 import io
 
 app = Flask(__name__)
 app.config.from_object(Config)
+preload_backends(app.config['PRELOAD_BACKENDS'])
+job_queue.init_app(app)
+
+DOWNLOAD_MIME_TYPES = {
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'pdf': 'application/pdf',
+    'markdown': 'text/markdown',
+    'md': 'text/markdown',
+    'html': 'text/html',
+    'zip': 'application/zip'
+}
+
+def download_mimetype(filename: str) -> str:
+    return DOWNLOAD_MIME_TYPES.get(filename.split('.')[-1].lower(), 'application/octet-stream')
+
+_file_etags = {}
+ETAG_CACHE_SIZE = 4096
+
+def file_etag(path: str) -> str:
+    """Strong ETag for a file: the SHA-256 of its content, hashed once per version of the file"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    etag = _file_etags.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        etag = digest.hexdigest()
+        if len(_file_etags) >= ETAG_CACHE_SIZE:
+            _file_etags.clear()
+        _file_etags[key] = etag
+    return etag
+
+def download_path(filename: str):
+    """Path of a generated document in the upload folder, or None for anything else there.
+
+    Only files at the top level with a document extension are served; the
+    document store and job files below it have their own routes.
+    """
+    if '/' in filename or '\\' in filename or filename.rsplit('.', 1)[-1].lower() not in DOWNLOAD_MIME_TYPES:
+        return None
+    return safe_join(os.path.abspath(app.config['UPLOAD_FOLDER']), filename)
+
+def accel_redirect_path(path: str):
+    """Internal nginx location for a file under the upload folder, when X-Accel-Redirect is configured"""
+    prefix = app.config['X_ACCEL_REDIRECT_PREFIX']
+    if not prefix:
+        return None
+    relative = os.path.relpath(path, os.path.abspath(app.config['UPLOAD_FOLDER']))
+    if relative.startswith('..'):
+        return None
+    return prefix.rstrip('/') + '/' + quote(relative.replace(os.sep, '/'))
+
+def serve_file(path: str, download_name: str) -> Response:
+    """Send a generated file with a content ETag, honouring If-None-Match and Range.
+
+    The bytes are handed to the front proxy when it supports it: nginx via
+    X_ACCEL_REDIRECT_PREFIX, or Apache/lighttpd via USE_X_SENDFILE.
+    """
+    if not os.path.isfile(path):
+        abort(404)
+    etag = file_etag(path)
+    accel_path = accel_redirect_path(path)
+    if accel_path is None:
+        return send_file(path, as_attachment=True, download_name=download_name,
+                         mimetype=download_mimetype(download_name), etag=etag, conditional=True)
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        # nginx serves the body, including Range requests, from the internal location
+        response = Response(mimetype=download_mimetype(download_name))
+        response.headers['X-Accel-Redirect'] = accel_path
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.set_etag(etag)
+    return response
+
+# Output format value requesting every format in one ZIP
+BUNDLE_FORMAT = 'all'
 
 # Ensure the upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -25,48 +115,319 @@ def select_form():
         return redirect(url_for('fill_form', form_type=form_type.name))
     return render_template('select_form.html', form=form)
 
+def document_response(generator, form_type: FormType) -> Response:
+    """Send a rendered document from memory without writing it to the upload folder"""
+    if generator.mimetype == 'text/html':
+        # HTML is displayed directly in the browser
+        return Response(generator.iter_chunks(), mimetype=generator.mimetype)
+
+    filename = f"{form_type.name.lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{generator.extension}"
+    if generator.mimetype.startswith('text/'):
+        response = Response(generator.iter_chunks(), mimetype=generator.mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    return send_file(
+        io.BytesIO(generator.to_bytes()),
+        as_attachment=True,
+        download_name=filename,
+        mimetype=generator.mimetype
+    )
+
+def bundle_response(form_type: FormType, form_data: dict, output_formats: list) -> Response:
+    """Render several formats of one document together and send them as a single ZIP"""
+    try:
+        documents = render_formats(form_type, form_data, output_formats)
+    except ValueError as e:
+        return str(e), 400
+    license_id = document_store.new_id()
+    for output_format, (extension, content) in documents.items():
+        document_store.keep(form_type, form_data, output_format, extension, content, license_id)
+    basename = f"{form_type.name.lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    buffer = io.BytesIO()
+    write_bundle(buffer, basename, documents)
+    buffer.seek(0)
+    response = send_file(buffer, as_attachment=True, download_name=f"{basename}.zip", mimetype='application/zip')
+    response.headers['X-License-Id'] = license_id
+    return response
+
+def add_profile_header(response: Response, profile: ProfileRun):
+    """Point to where a profiled request's stats are (or, for a streamed response, will be) saved"""
+    if profile.active:
+        response.headers['X-Profile'] = url_for('download_profile', filename=profile.filename)
+
+def format_label(output_format) -> str:
+    """A requested output format as a metrics label: its value if it is a known format, and '' otherwise"""
+    try:
+        return OutputFormat(str(output_format).lower()).value
+    except ValueError:
+        return ''
+
+def issue_document(form_type: FormType, form_data: dict, output_format: str) -> Response:
+    """Render one validated document, keep it in the document store and send it"""
+    label = format_label(output_format)
+    # An unknown format is refused by the render below, so only known formats are profiled
+    if label:
+        profile = profiler.for_request(request, f"{form_type.name.lower()}_{label}")
+    else:
+        profile = ProfileRun(profiler.directory, label, False)
+    # Profiled requests skip the cache so the profile shows the rendering
+    render = DocumentGeneratorFactory.create_generator if profile.active else document_cache.render
+    try:
+        with profile:
+            generator = render(form_type, form_data, output_format)
+            content = generator.to_bytes()
+    except ValueError as e:
+        return str(e), 400
+
+    # Keep the issued document; it is rendered once and sent from memory
+    document = CachedDocument(content, generator.mimetype, generator.extension)
+    with metrics.timer('store', form_type, label):
+        document_id = document_store.keep(form_type, form_data, OutputFormat(output_format.lower()),
+                                          document.extension, document.content)
+    response = document_response(document, form_type)
+    response.headers['X-Document-Id'] = document_id
+    add_profile_header(response, profile)
+    return response
+
 @app.route('/form/<form_type>', methods=['GET', 'POST'])
 def fill_form(form_type):
     form_type_enum = FormType[form_type]
     form = FormFactory.create_form(form_type_enum)
     
-    if form.validate_on_submit():
-        # Create form data dictionary
-        form_data = {field.name: field.data for field in form}
-        
-        # Generate HTML document
-        generator = DocumentGeneratorFactory.create_generator(
-            form_type_enum, 
-            form_data, 
-            OutputFormat.HTML.value
-        )
-        html_content = generator.generate()
+    submitted = False
+    if request.method == 'POST':
+        with metrics.timer('validate', form_type_enum, format_label(request.form.get('output_format'))):
+            submitted = form.validate_on_submit()
+    if submitted:
+        # Create form data dictionary; the CSRF token changes on every page load and is not license data
+        form_data = {field.name: field.data for field in form if field.name != form.meta.csrf_field_name}
+        output_format = request.form.get('output_format', OutputFormat.HTML.value)
+        output_formats = request.form.getlist('output_format')
+        if output_format == BUNDLE_FORMAT or len(output_formats) > 1:
+            return bundle_response(
+                form_type_enum,
+                form_data,
+                list(OutputFormat) if output_format == BUNDLE_FORMAT else output_formats
+            )
         
-        # Return HTML content directly to be displayed in browser
-        return html_content
+        return issue_document(form_type_enum, form_data, output_format)
     
-    return render_template('form.html', form=form, form_type=form_type_enum.value)
+    return render_template('form.html', form=form, form_type=form_type_enum.value,
+                           output_formats=list(OutputFormat), bundle_format=BUNDLE_FORMAT)
+
+@app.route('/batch/<form_type>', methods=['POST'])
+def batch_generate(form_type):
+    """Generate one document per row of an uploaded CSV or JSONL file, streamed back as a ZIP"""
+    try:
+        form_type_enum = FormType[form_type]
+    except KeyError:
+        return f"Unknown form type: {form_type}", 404
+    upload = request.files.get('file')
+    if upload is None:
+        return "Upload the batch as a 'file' field", 400
+    try:
+        output_format = OutputFormat(request.values.get('output_format', OutputFormat.DOCX.value).lower()).value
+        input_format = request.values.get('input_format') or input_format_for(upload.filename)
+        rows = read_rows(upload.stream, input_format)
+    except ValueError as e:
+        return str(e), 400
+
+    filename = f"{form_type_enum.name.lower()}_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    profile = profiler.for_request(request, f"{form_type_enum.name.lower()}_batch_{output_format}")
+    if profile.active:
+        # Render in this process, where the profiler can see it, and profile while the archive streams
+        renderer = BatchRenderer(form_type_enum, output_format, workers=1)
+        chunks = profile.wrap(iter_batch(form_type_enum, rows, output_format, renderer))
+    else:
+        chunks = iter_batch(form_type_enum, rows, output_format)
+    # The request context keeps the upload open while the archive streams
+    response = Response(stream_with_context(chunks), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    add_profile_header(response, profile)
+    return response
+
+@app.route('/api/<form_type>', methods=['GET', 'POST'])
+def api_generate(form_type):
+    """Generate a document from a JSON body, validated against the form's schema rather than WTForms.
+
+    GET describes the fields the form type expects.
+    """
+    try:
+        form_type_enum = FormType[form_type]
+    except KeyError:
+        return jsonify(error=f"Unknown form type: {form_type}"), 404
+    schema = get_schema(form_type_enum)
+    if request.method == 'GET':
+        return jsonify(form_type=form_type_enum.name, fields=schema.describe())
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('form_data'), dict):
+        return jsonify(error="Send a JSON body with a 'form_data' object"), 400
+    output_format = str(payload.get('output_format', OutputFormat.PDF.value)).lower()
+    if output_format != BUNDLE_FORMAT:
+        try:
+            output_format = OutputFormat(output_format).value
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+    with metrics.timer('validate', form_type_enum, output_format):
+        form_data, errors = schema.validate(payload['form_data'])
+    if errors:
+        return jsonify(error='Invalid form data', fields=errors), 400
+    if output_format == BUNDLE_FORMAT:
+        return bundle_response(form_type_enum, form_data, list(OutputFormat))
+    return issue_document(form_type_enum, form_data, output_format)
+
+@app.before_request
+def start_background_threads():
+    # Job and retention threads are started lazily so each forked worker gets its own
+    job_queue.ensure_started()
+    document_store.ensure_started()
+
+@app.before_request
+def start_request_timing():
+    if metrics.enabled:
+        metrics.start_request()
+
+@app.after_request
+def add_server_timing(response):
+    if metrics.enabled:
+        server_timing = metrics.server_timing()
+        if server_timing:
+            response.headers['Server-Timing'] = server_timing
+    return response
+
+def job_status(job: dict) -> dict:
+    status = {name: job[name] for name in ('id', 'kind', 'status', 'progress', 'total', 'error', 'created_at', 'updated_at')}
+    status['status_url'] = url_for('get_job', job_id=job['id'])
+    if job['status'] == DONE:
+        status['download_url'] = url_for('download_job', job_id=job['id'])
+    return status
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a document (JSON body) or a batch (uploaded CSV/JSONL file) for background generation"""
+    upload = request.files.get('file')
+    payload = request.get_json(silent=True) if upload is None else None
+    if payload is not None and not isinstance(payload, dict):
+        return jsonify(error="Send a JSON body with 'form_data' or upload a batch as a 'file' field"), 400
+    values = payload if payload is not None else request.values
+    # JSON bodies may hold any type here, so names are compared as strings
+    form_type_name = str(values.get('form_type', FormType.DHA_LICENSE_A.name))
+    try:
+        form_type = FormType[form_type_name]
+    except KeyError:
+        return jsonify(error=f"Unknown form type: {form_type_name}"), 400
+    try:
+        default_format = OutputFormat.DOCX.value if upload is not None else OutputFormat.PDF.value
+        output_format = OutputFormat(str(values.get('output_format', default_format)).lower()).value
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    if upload is not None:
+        try:
+            input_format = values.get('input_format') or input_format_for(upload.filename)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        if input_format not in INPUT_FORMATS:
+            return jsonify(error=f"Unsupported batch input format: {input_format}"), 400
+        job_id = job_queue.new_id()
+        input_path = job_queue.input_path(job_id, input_format)
+        os.makedirs(os.path.dirname(input_path), exist_ok=True)
+        upload.save(input_path)
+        job_queue.submit(BATCH, form_type, output_format,
+                         {'input_path': input_path, 'input_format': input_format}, job_id)
+    elif payload is not None and isinstance(payload.get('form_data'), dict):
+        form_data, errors = validate_row(form_type, payload['form_data'])
+        if errors:
+            return jsonify(error='Invalid form data', fields=errors), 400
+        job_id = job_queue.submit(DOCUMENT, form_type, output_format, {'form_data': payload['form_data']})
+    else:
+        return jsonify(error="Send a JSON body with 'form_data' or upload a batch as a 'file' field"), 400
+
+    response = jsonify(job_status(job_queue.get(job_id)))
+    response.status_code = 202
+    response.headers['Location'] = url_for('get_job', job_id=job_id)
+    return response
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error='Job not found'), 404
+    return jsonify(job_status(job))
+
+def job_download_name(job: dict) -> str:
+    extension = os.path.splitext(job['result_path'])[1]
+    return f"{job['form_type'].lower()}_{job['id']}{extension}"
+
+@app.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job['status'] != DONE:
+        return jsonify(error='Job not found or not finished'), 404
+    return serve_file(os.path.abspath(job['result_path']), job_download_name(job))
+
+def document_download_name(document: dict) -> str:
+    return f"{document['form_type'].lower()}_{document['id']}.{document['format']}"
+
+def document_status(document: dict) -> dict:
+    status = {name: document[name] for name in ('id', 'license_id', 'form_type', 'plot_number', 'format', 'size', 'created_at',
+                                                'storage', 'template_version')}
+    status['download_url'] = url_for('download_document', document_id=document['id'])
+    return status
+
+@app.route('/documents')
+def find_documents():
+    """Stored documents of a license or plot, newest first"""
+    license_id = request.args.get('license_id')
+    plot_number = request.args.get('plot_number')
+    if license_id is None and plot_number is None:
+        return jsonify(error="Pass 'license_id' or 'plot_number'"), 400
+    return jsonify([document_status(document) for document in document_store.find(license_id, plot_number)])
+
+@app.route('/documents/<document_id>')
+def download_document(document_id):
+    document = document_store.get(document_id)
+    if document is None:
+        return jsonify(error='Document not found'), 404
+    if document['path'] is not None:
+        return serve_file(os.path.abspath(document['path']), document_download_name(document))
+    # Archived documents are rendered again from their stored context
+    try:
+        content = document_store.load(document)
+    except TemplateChangedError as e:
+        return jsonify(error=str(e)), 409
+    return send_file(io.BytesIO(content), as_attachment=True, download_name=document_download_name(document),
+                     mimetype=download_mimetype(document_download_name(document)),
+                     etag=hashlib.sha256(content).hexdigest(), conditional=True)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(document_cache.stats())
+
+@app.route('/profiles/<filename>')
+def download_profile(filename):
+    """A saved cProfile run, for requests carrying the profile token"""
+    if not profiler.authorized(request):
+        abort(403)
+    path = safe_join(os.path.abspath(profiler.directory), filename) if filename.endswith('.prof') else None
+    if path is None:
+        abort(404)
+    return serve_file(path, filename)
 
 @app.route('/download/<path:filename>')
 def download_file(filename):
-    try:
-        # Get file extension
-        ext = filename.split('.')[-1].lower()
-        mime_types = {
-            'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'markdown': 'text/markdown',
-            'md': 'text/markdown',
-            'html': 'text/html'
-        }
-        
-        return send_file(
-            os.path.join(app.config['UPLOAD_FOLDER'], filename),
-            as_attachment=True,
-            download_name=filename,
-            mimetype=mime_types.get(ext, 'application/octet-stream')
-        )
-    except Exception as e:
-        return str(e)
+    path = download_path(filename)
+    if path is None:
+        abort(404)
+    return serve_file(path, filename)
 
 if __name__ == '__main__':
     # Only use debug mode when running locally
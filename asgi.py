@@ -0,0 +1,180 @@
+"""ASGI entry point, e.g. ``uvicorn asgi:application --workers 4``.
+
+Downloads of generated files are served natively: the file is read in an
+executor and written to the client asynchronously, so a slow client costs
+an idle coroutine instead of a worker thread. Every other route runs the
+Flask app on a thread pool, which keeps form rendering off the event loop.
+"""
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from werkzeug.http import parse_etags, parse_range_header, quote_etag, unquote_etag
+from app import (app, accel_redirect_path, document_download_name, download_mimetype, download_path, file_etag,
+                 job_download_name)
+from config import Config
+from document_store import document_store
+from jobs import job_queue, DONE
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+DOWNLOAD_ROUTE = re.compile(r'^/download/(?P<filename>.+)$')
+JOB_DOWNLOAD_ROUTE = re.compile(r'^/jobs/(?P<job_id>[0-9a-f]+)/download$')
+DOCUMENT_ROUTE = re.compile(r'^/documents/(?P<document_id>[0-9a-f]+)$')
+
+# Runs the Flask app, and with it all CPU-bound rendering
+wsgi_executor = ThreadPoolExecutor(max_workers=Config.ASGI_THREADS, thread_name_prefix='wsgi')
+# Blocking file and database reads for native downloads
+io_executor = ThreadPoolExecutor(max_workers=Config.ASGI_THREADS, thread_name_prefix='download')
+
+
+class _ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs every WSGI request on one shared thread by default;
+    # run them concurrently on our own pool instead
+    _run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run_wsgi_app, thread_sensitive=False, executor=wsgi_executor)(body)
+
+
+class _ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await _ThreadPoolWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+wsgi_application = _ThreadPoolWsgiToAsgi(app)
+
+
+async def _send_text(send, status: int, text: str):
+    body = text.encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain; charset=utf-8'), (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _request_headers(scope) -> dict:
+    return {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+
+async def send_file(send, scope, path: str, download_name: str, head: bool = False):
+    """Stream a file as an attachment without holding a thread while the client reads.
+
+    Supports If-None-Match against the content ETag, a single byte range,
+    and X-Accel-Redirect when nginx serves the upload folder.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        f = await loop.run_in_executor(io_executor, open, path, 'rb')
+    except (FileNotFoundError, IsADirectoryError):
+        await _send_text(send, 404, 'File not found')
+        return
+    try:
+        size = os.fstat(f.fileno()).st_size
+        etag = await loop.run_in_executor(io_executor, file_etag, path)
+        request_headers = _request_headers(scope)
+        headers = [
+            (b'etag', quote_etag(etag).encode('latin-1')),
+            (b'accept-ranges', b'bytes'),
+            (b'content-disposition', f'attachment; filename="{download_name}"'.encode('utf-8'))
+        ]
+        if parse_etags(request_headers.get('if-none-match')).contains(etag):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        headers.append((b'content-type', download_mimetype(download_name).encode('latin-1')))
+
+        accel_path = accel_redirect_path(path)
+        if accel_path is not None:
+            headers.append((b'x-accel-redirect', accel_path.encode('latin-1')))
+            await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        status, start, end = 200, 0, size
+        byte_range = parse_range_header(request_headers.get('range'))
+        if_range = request_headers.get('if-range')
+        if byte_range is not None and (if_range is None or unquote_etag(if_range) == (etag, False)):
+            span = byte_range.range_for_length(size)
+            if span is None:
+                headers.append((b'content-range', f'bytes */{size}'.encode()))
+                await send({'type': 'http.response.start', 'status': 416, 'headers': headers})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            status, (start, end) = 206, span
+            headers.append((b'content-range', f'bytes {start}-{end - 1}/{size}'.encode()))
+        headers.append((b'content-length', str(end - start).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        if head or start == end:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await loop.run_in_executor(io_executor, f.seek, start)
+        remaining = end - start
+        while remaining:
+            chunk = await loop.run_in_executor(io_executor, f.read, min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': bool(remaining)})
+        if remaining:
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        f.close()
+
+
+async def download_file(send, scope, filename: str, head: bool):
+    path = download_path(filename)
+    if path is None:
+        await _send_text(send, 404, 'File not found')
+        return
+    await send_file(send, scope, path, filename, head)
+
+
+async def download_job(send, scope, job_id: str, head: bool):
+    job = await asyncio.get_running_loop().run_in_executor(io_executor, job_queue.get, job_id)
+    if job is None or job['status'] != DONE:
+        await _send_text(send, 404, 'Job not found or not finished')
+        return
+    await send_file(send, scope, os.path.abspath(job['result_path']), job_download_name(job), head)
+
+
+async def download_document(scope, receive, send, document_id: str, head: bool):
+    document = await asyncio.get_running_loop().run_in_executor(io_executor, document_store.get, document_id)
+    if document is None:
+        await _send_text(send, 404, 'Document not found')
+        return
+    if document['path'] is None:
+        # Archived documents are rendered again, which belongs on the Flask thread pool
+        await wsgi_application(scope, receive, send)
+        return
+    await send_file(send, scope, os.path.abspath(document['path']), document_download_name(document), head)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+        head = scope['method'] == 'HEAD'
+        match = DOWNLOAD_ROUTE.match(scope['path'])
+        if match:
+            await download_file(send, scope, match['filename'], head)
+            return
+        match = JOB_DOWNLOAD_ROUTE.match(scope['path'])
+        if match:
+            await download_job(send, scope, match['job_id'], head)
+            return
+        match = DOCUMENT_ROUTE.match(scope['path'])
+        if match:
+            await download_document(scope, receive, send, match['document_id'], head)
+            return
+    elif scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    await wsgi_application(scope, receive, send)
@@ -0,0 +1,303 @@
+import argparse
+import collections
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from document_generator import DocumentGeneratorFactory, OutputFormat, warm_up_generators
+from config import FormType, Config
+from zip_stream import ZipStreamWriter
+from fees import compute_columns
+from schema import validate
+
+INPUT_FORMATS = ('csv', 'jsonl')
+MANIFEST_NAME = 'manifest.csv'
+MANIFEST_SPOOL_SIZE = 1024 * 1024  # Manifest is kept in memory up to this size, then spooled to disk
+MANIFEST_CHUNK_SIZE = 64 * 1024
+FEE_WINDOW = 256  # Rows whose fees are computed together
+
+
+def input_format_for(filename: str) -> str:
+    """Guess the batch input format from a file name"""
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if ext in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if ext == 'csv':
+        return 'csv'
+    raise ValueError(f"Unsupported batch input: {filename}. Supported formats are: {', '.join(INPUT_FORMATS)}")
+
+
+def _csv_rows(text):
+    yield from csv.DictReader(text)
+
+
+def _jsonl_rows(text):
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield e
+            continue
+        yield row if isinstance(row, dict) else ValueError("Row is not a JSON object")
+
+
+def read_rows(stream, input_format: str):
+    """Return an iterator of one dict per row of a CSV or JSONL byte stream.
+
+    Rows are read lazily; a JSONL line that cannot be parsed is yielded as
+    the exception instead of a dict.
+    """
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Unsupported batch input format: {input_format}")
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return _csv_rows(text) if input_format == 'csv' else _jsonl_rows(text)
+
+
+def validate_row(form_type: FormType, row: dict):
+    """Validate a row against the form definition's compiled schema.
+
+    Returns ``(form_data, errors)``; form_data is None when the row is invalid.
+    """
+    return validate(form_type, row)
+
+
+def _format_errors(errors) -> str:
+    if isinstance(errors, Exception):
+        return str(errors)
+    return '; '.join(f"{name}: {' '.join(messages)}" for name, messages in errors.items())
+
+
+def _render_chunk(form_type: FormType, output_format: str, chunk: list) -> list:
+    """Render a chunk of ``(number, form_data, error)`` items into ``(number, extension, content, error)``"""
+    results = []
+    for number, form_data, error in chunk:
+        if form_data is None:
+            results.append((number, None, None, error))
+            continue
+        try:
+            generator = DocumentGeneratorFactory.create_generator(form_type, form_data, output_format)
+            results.append((number, generator.extension, generator.to_bytes(), None))
+        except Exception as e:
+            results.append((number, None, None, str(e)))
+    return results
+
+
+# Render processes are not forked from the caller, whose other threads (jobs, retention, the
+# ASGI pool) may hold locks a forked child would inherit held; spawn is the fallback
+RENDER_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+_pools = {}
+_pools_pid = None
+_pool_lock = threading.Lock()
+
+
+def _render_pool(workers: int) -> ProcessPoolExecutor:
+    """This process's pool of ``workers`` render processes, shared by all of its batches.
+
+    Pools are kept by size, so a batch always gets the number of processes
+    it asked for; the web app and job threads always ask for
+    ``BATCH_WORKERS``, so they share one. A pool is created on first use,
+    and again in a forked child or after a render process died. With
+    forkserver, the server imports the generator modules once and each
+    render process starts from it.
+    """
+    global _pools_pid
+    with _pool_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(workers)
+        if pool is None:
+            context = multiprocessing.get_context(RENDER_START_METHOD)
+            if RENDER_START_METHOD == 'forkserver':
+                context.set_forkserver_preload(['document_generator'])
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=warm_up_generators)
+            _pools[workers] = pool
+        return pool
+
+
+def _discard_pool(workers: int, pool: ProcessPoolExecutor):
+    with _pool_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class BatchRenderer:
+    """Render documents for a batch across a pool of worker processes.
+
+    Rows are sent to the workers in chunks of ``chunk_size``, and only a
+    few chunks per worker are in flight at once, so memory stays bounded
+    however long the input is. Results come back in input order. The
+    worker processes belong to the process, not the batch: concurrent
+    batches of the same size share one pool, so a web worker never runs
+    more than ``BATCH_WORKERS`` render processes, and each warms its
+    generator caches once. With a single worker, rendering happens in the calling
+    process.
+    """
+
+    def __init__(self, form_type: FormType, output_format: str = OutputFormat.DOCX.value,
+                 workers: int = None, chunk_size: int = None):
+        self.form_type = form_type
+        self.output_format = output_format
+        self.workers = max(1, workers or Config.BATCH_WORKERS)
+        self.chunk_size = max(1, chunk_size or Config.BATCH_CHUNK_SIZE)
+
+    def _chunks(self, items):
+        items = iter(items)
+        chunk = list(islice(items, self.chunk_size))
+        while chunk:
+            yield chunk
+            chunk = list(islice(items, self.chunk_size))
+
+    def map(self, items):
+        """Render ``(number, form_data, error)`` items, yielding ``(number, extension, content, error)`` in order"""
+        if self.workers == 1:
+            for chunk in self._chunks(items):
+                yield from _render_chunk(self.form_type, self.output_format, chunk)
+            return
+
+        executor = _render_pool(self.workers)
+        pending = collections.deque()
+        try:
+            for chunk in self._chunks(items):
+                pending.append(executor.submit(_render_chunk, self.form_type, self.output_format, chunk))
+                if len(pending) >= 2 * self.workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        except BrokenProcessPool:
+            _discard_pool(self.workers, executor)
+            raise
+        finally:
+            # Only this batch's work is cancelled; the pool stays up for the next one
+            for future in pending:
+                future.cancel()
+
+
+class _ChunkPipe:
+    """Write-only stream whose contents are collected by a response generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes):
+        self._chunks.append(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _prepare_rows(form_type: FormType, rows):
+    for number, row in enumerate(rows, start=1):
+        if isinstance(row, Exception):
+            yield number, None, _format_errors(row)
+            continue
+        try:
+            form_data, errors = validate_row(form_type, row)
+        except Exception as e:
+            # One malformed row is reported in the manifest rather than ending the batch
+            yield number, None, _format_errors(e)
+            continue
+        yield number, form_data, _format_errors(errors) if errors else None
+
+
+def _precompute_fees(items):
+    """Add premium and ground rent totals to the valid rows, computed column-wise a window of rows at a time"""
+    items = iter(items)
+    window = list(islice(items, FEE_WINDOW))
+    while window:
+        valid = [form_data for _, form_data, _ in window if form_data is not None]
+        totals, ground_rents = compute_columns(
+            [form_data.get('plot_area') for form_data in valid],
+            [form_data.get('premium_rate') for form_data in valid],
+            [form_data.get('ground_rent_rate') for form_data in valid]
+        )
+        for form_data, total, ground_rent in zip(valid, totals, ground_rents):
+            if total is not None:
+                form_data['total_premium'] = total
+                form_data['annual_ground_rent'] = ground_rent
+        yield from window
+        window = list(islice(items, FEE_WINDOW))
+
+
+def write_batch(stream, form_type: FormType, rows, output_format: str = OutputFormat.DOCX.value,
+                renderer: BatchRenderer = None):
+    """Render every row into a ZIP archive on ``stream``, one document per valid row.
+
+    Yields the row number after each row, and None once the archive is
+    complete, so a caller can flush ``stream`` or report progress. Rows
+    that fail validation or rendering are listed in ``manifest.csv``
+    instead of aborting the batch.
+    """
+    renderer = renderer or BatchRenderer(form_type, output_format)
+    prefix = form_type.name.lower()
+    with tempfile.SpooledTemporaryFile(max_size=MANIFEST_SPOOL_SIZE, mode='w+', newline='') as manifest:
+        writer = csv.writer(manifest)
+        writer.writerow(['row', 'file', 'status', 'errors'])
+        archive = ZipStreamWriter(stream)
+        # Rows are validated here and rendered by the pool
+        for number, extension, content, error in renderer.map(_precompute_fees(_prepare_rows(form_type, rows))):
+            if error is not None:
+                writer.writerow([number, '', 'error', error])
+            else:
+                filename = f"{prefix}_{number:05d}.{extension}"
+                archive.writestr(filename, content)
+                writer.writerow([number, filename, 'ok', ''])
+            yield number
+        manifest.seek(0)
+        archive.write_stream(MANIFEST_NAME, (
+            chunk.encode('utf-8') for chunk in iter(lambda: manifest.read(MANIFEST_CHUNK_SIZE), '')
+        ))
+        archive.close()
+        yield None
+
+
+def iter_batch(form_type: FormType, rows, output_format: str = OutputFormat.DOCX.value,
+               renderer: BatchRenderer = None):
+    """Yield the ZIP archive for a batch as byte chunks, one or more per document"""
+    pipe = _ChunkPipe()
+    for _ in write_batch(pipe, form_type, rows, output_format, renderer):
+        data = pipe.drain()
+        if data:
+            yield data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a ZIP of license documents from a CSV or JSONL file.')
+    parser.add_argument('input', help='CSV or JSONL file with one row per license, keyed by form field name')
+    parser.add_argument('-o', '--output', required=True, help='Path of the ZIP archive to write')
+    parser.add_argument('-t', '--form-type', default=FormType.DHA_LICENSE_A.name,
+                        choices=[form_type.name for form_type in FormType])
+    parser.add_argument('-f', '--format', default=OutputFormat.DOCX.value,
+                        choices=[output_format.value for output_format in OutputFormat])
+    parser.add_argument('--input-format', choices=INPUT_FORMATS, help='Defaults to the input file extension')
+    parser.add_argument('-w', '--workers', type=int, default=Config.BATCH_WORKERS,
+                        help='Render processes (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=Config.BATCH_CHUNK_SIZE,
+                        help='Rows sent to a render process per task (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    form_type = FormType[args.form_type]
+    input_format = args.input_format or input_format_for(args.input)
+    renderer = BatchRenderer(form_type, args.format, args.workers, args.chunk_size)
+    with open(args.input, 'rb') as source, open(args.output, 'wb') as target:
+        for _ in write_batch(target, form_type, read_rows(source, input_format), args.format, renderer):
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Compare two benchmark result files, e.g. from the commits before and after a change.
+
+    python benchmarks/compare.py before.json after.json --threshold 10
+
+Exits with status 1 when any case's p50 latency or throughput got worse by
+more than the threshold percentage.
+"""
+import argparse
+import json
+import sys
+
+# Fields identifying a case in generators.py and web.py results
+KEY_FIELDS = ('generator', 'output_format', 'operation', 'size')
+
+
+def case_key(result: dict) -> tuple:
+    return tuple(result.get(name) for name in KEY_FIELDS)
+
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Percent slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = {case_key(result): result for result in json.load(f)['results']}
+    with open(args.after) as f:
+        after = [result for result in json.load(f)['results'] if case_key(result) in before]
+
+    regressions = 0
+    print(f"{'case':<36}{'p50 ms':>16}{'change':>9}{'per s':>18}{'change':>9}")
+    for result in after:
+        old = before[case_key(result)]
+        latency = change(old['p50_ms'], result['p50_ms'])
+        throughput = change(old['throughput_per_s'], result['throughput_per_s'])
+        regressed = latency > args.threshold or -throughput > args.threshold
+        regressions += regressed
+        name = ' '.join(str(value) for value in case_key(result) if value is not None)
+        print(f"{name:<36}{old['p50_ms']:>7.2f} -> {result['p50_ms']:<6.2f}{latency:>+8.1f}%"
+              f"{old['throughput_per_s']:>8.1f} -> {result['throughput_per_s']:<6.1f}{throughput:>+8.1f}%"
+              f"{'  REGRESSION' if regressed else ''}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
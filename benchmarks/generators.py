@@ -0,0 +1,96 @@
+"""Measure every document generator: generate() and save() latency, throughput, memory and output size.
+
+Batches of randomized rows are rendered in-process after the caches are warm:
+
+    python benchmarks/generators.py --sizes 1,1000,10000 --json generators.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import cycle, islice
+
+from workload import environment, parse_sizes, sample_rows, summarize
+
+from config import FormType
+from document_generator import HtmlGenerator, MarkdownGenerator, warm_up_generators
+from docx_generator import DocxGenerator
+from pdf_generator import PDFGenerator
+
+GENERATORS = [DocxGenerator, PDFGenerator, HtmlGenerator, MarkdownGenerator]
+OPERATIONS = ('generate', 'save')
+
+
+def run_once(generator_class, operation: str, form_data: dict, output_path: str):
+    generator = generator_class(form_data, FormType.DHA_LICENSE_A)
+    if operation == 'generate':
+        generator.generate()
+    else:
+        generator.save(output_path)
+
+
+def measure(generator_class, operation: str, rows: list, output_path: str, memory_sample: int) -> dict:
+    latencies = []
+    output_bytes = 0
+    started = time.perf_counter()
+    for form_data in rows:
+        start = time.perf_counter()
+        run_once(generator_class, operation, form_data, output_path)
+        latencies.append(time.perf_counter() - start)
+        if operation == 'save':
+            output_bytes += os.path.getsize(output_path)
+    result = summarize(latencies, time.perf_counter() - started)
+
+    # tracemalloc slows rendering several times over, so memory is measured in a separate, shorter pass
+    tracemalloc.start()
+    for form_data in rows[:memory_sample]:
+        run_once(generator_class, operation, form_data, output_path)
+    result['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    if operation == 'save':
+        result['output_bytes_mean'] = output_bytes / len(rows)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=parse_sizes, default=[1, 1000, 10000], help='Batch sizes (default: 1,1000,10000)')
+    parser.add_argument('--generators', default=','.join(cls.__name__ for cls in GENERATORS),
+                        help='Generator classes to measure (default: all)')
+    parser.add_argument('--memory-sample', type=int, default=50, help='Documents rendered under tracemalloc per batch')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args(argv)
+
+    selected = [cls for cls in GENERATORS if cls.__name__ in args.generators.split(',')]
+    distinct = sample_rows(min(max(args.sizes), 1000), seed=args.seed)
+    warm_up_generators()
+
+    results = []
+    print(f"{'generator':<18}{'op':<10}{'docs':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}"
+          f"{'docs/s':>9}{'peak KB':>10}{'out KB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for generator_class in selected:
+            output_path = os.path.join(directory, f"out.{generator_class.extension}")
+            for operation in OPERATIONS:
+                for size in args.sizes:
+                    rows = list(islice(cycle(distinct), size))
+                    result = measure(generator_class, operation, rows, output_path, args.memory_sample)
+                    result.update(generator=generator_class.__name__, operation=operation, size=size)
+                    results.append(result)
+                    output_kb = result.get('output_bytes_mean', 0) / 1024
+                    print(f"{generator_class.__name__:<18}{operation:<10}{size:>7}{result['p50_ms']:>9.2f}"
+                          f"{result['p90_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['throughput_per_s']:>9.1f}"
+                          f"{result['peak_memory_kb']:>10.0f}{output_kb:>9.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Measure worker cold start: time to import the app and resident memory afterwards.
+
+Each scenario runs in a fresh interpreter, as a newly started worker would:
+
+    python benchmarks/startup.py --repeat 5 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+render = sys.argv[1]
+if render:
+    from datetime import date
+    from config import Config, FormType
+    from document_generator import DocumentGeneratorFactory
+    data = dict(Config.DEFAULT_VALUES[FormType.DHA_LICENSE_A])
+    data.update(kpt_book_date=date.today(), kpt_mf_roll_date=date.today(), transfer_order_date=date.today())
+    DocumentGeneratorFactory.create_generator(FormType.DHA_LICENSE_A, data, render).to_bytes()
+rendered = time.perf_counter()
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open('/proc/self/status') as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+except OSError:
+    pass
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_render_ms': (rendered - imported) * 1000,
+    'rss_kb': rss_kb,
+    'modules': len(sys.modules)
+}))
+'''
+
+# (name, PRELOAD_BACKENDS, output format rendered after import)
+SCENARIOS = [
+    ('lazy', '', ''),
+    ('lazy+html', '', 'html'),
+    ('lazy+docx', '', 'docx'),
+    ('lazy+pdf', '', 'pdf'),
+    ('preload', 'docx,pdf', ''),
+    ('preload+pdf', 'docx,pdf', 'pdf'),
+]
+
+
+def run_probe(preload: str, render: str) -> dict:
+    env = dict(os.environ, PRELOAD_BACKENDS=preload)
+    output = subprocess.run([sys.executable, '-c', PROBE, render], cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='Interpreters started per scenario')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'scenario':<14}{'import ms':>11}{'render ms':>11}{'rss MB':>9}{'modules':>9}")
+    for name, preload, render in SCENARIOS:
+        runs = [run_probe(preload, render) for _ in range(args.repeat)]
+        result = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        result.update(preload=preload, render=render, repeat=args.repeat)
+        results[name] = result
+        print(f"{name:<14}{result['import_ms']:>11.1f}{result['first_render_ms']:>11.1f}"
+              f"{result['rss_kb'] / 1024:>9.1f}{result['modules']:>9.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
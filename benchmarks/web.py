@@ -0,0 +1,95 @@
+"""Measure the HTTP path: form submission through Flask's test client, per output format.
+
+Covers WTForms validation, rendering, storing the issued document and building
+the response. The document cache is off and issued documents go to a temporary
+store, so every request renders:
+
+    python benchmarks/web.py --sizes 1,1000 --json web.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import cycle, islice
+
+from workload import environment, parse_sizes, sample_rows, summarize
+
+STORE = tempfile.TemporaryDirectory()
+os.environ.update(DOCUMENT_CACHE_SIZE='0', DOCUMENT_STORE_FOLDER=STORE.name, DATA_FOLDER=STORE.name, JOB_WORKERS='0')
+
+from app import app  # noqa: E402
+from config import FormType  # noqa: E402
+from document_generator import OutputFormat, warm_up_generators  # noqa: E402
+
+URL = f"/form/{FormType.DHA_LICENSE_A.name}"
+
+
+def form_fields(row: dict, output_format: str) -> dict:
+    fields = {name: value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
+              for name, value in row.items()}
+    fields['output_format'] = output_format
+    return fields
+
+
+def post(client, fields: dict) -> int:
+    response = client.post(URL, data=fields)
+    if response.status_code != 200:
+        raise RuntimeError(f"{URL} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return len(response.get_data())
+
+
+def measure(client, requests: list, memory_sample: int) -> dict:
+    latencies = []
+    response_bytes = 0
+    started = time.perf_counter()
+    for fields in requests:
+        start = time.perf_counter()
+        response_bytes += post(client, fields)
+        latencies.append(time.perf_counter() - start)
+    result = summarize(latencies, time.perf_counter() - started)
+    tracemalloc.start()
+    for fields in requests[:memory_sample]:
+        post(client, fields)
+    result['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    result['output_bytes_mean'] = response_bytes / len(requests)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=parse_sizes, default=[1, 1000, 10000], help='Requests per batch (default: 1,1000,10000)')
+    parser.add_argument('--formats', default=','.join(f.value for f in OutputFormat),
+                        help='Output formats to request (default: all)')
+    parser.add_argument('--memory-sample', type=int, default=50, help='Requests made under tracemalloc per batch')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args(argv)
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    distinct = sample_rows(min(max(args.sizes), 1000), seed=args.seed)
+    warm_up_generators()
+
+    results = []
+    print(f"{'format':<10}{'requests':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'req/s':>9}{'peak KB':>10}{'out KB':>9}")
+    for output_format in args.formats.split(','):
+        for size in args.sizes:
+            requests = [form_fields(row, output_format) for row in islice(cycle(distinct), size)]
+            result = measure(client, requests, args.memory_sample)
+            result.update(output_format=output_format, size=size)
+            results.append(result)
+            print(f"{output_format:<10}{size:>9}{result['p50_ms']:>9.2f}{result['p90_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                  f"{result['throughput_per_s']:>9.1f}{result['peak_memory_kb']:>10.0f}{result['output_bytes_mean'] / 1024:>9.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Shared inputs and statistics for the benchmarks."""
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config import Config, FormType  # noqa: E402
+
+DATE_FIELDS = ('kpt_book_date', 'kpt_mf_roll_date', 'transfer_order_date')
+NAMES = ['Muhammad Ahmed', 'Ayesha Siddiqui', 'Bilal Hassan', 'Fatima Zahra', 'Usman Tariq',
+         'Sana Malik', 'Hamza Sheikh', 'Zainab Qureshi', 'Imran Raza', 'Hira Farooq']
+
+
+def sample_rows(count: int, form_type: FormType = FormType.DHA_LICENSE_A, seed: int = 0) -> list:
+    """``Config.DEFAULT_VALUES`` followed by ``count - 1`` randomized variations of it"""
+    rng = random.Random(seed)
+    defaults = dict(Config.DEFAULT_VALUES[form_type])
+    defaults.update({name: date(2024, 1, 15) for name in DATE_FIELDS})
+    rows = [defaults]
+    for _ in range(count - 1):
+        row = {}
+        for name, value in defaults.items():
+            if isinstance(value, date):
+                row[name] = value + timedelta(days=rng.randint(0, 3650))
+            elif isinstance(value, float):
+                row[name] = round(value * rng.uniform(0.5, 2.0), 2)
+            elif name.endswith('_name'):
+                row[name] = rng.choice(NAMES)
+            elif name.endswith('_cnic'):
+                row[name] = f"{rng.randint(10000, 99999)}-{rng.randint(1000000, 9999999)}-{rng.randint(0, 9)}"
+            else:
+                row[name] = f"{value} {rng.randint(1, 9999)}"
+        rows.append(row)
+    return rows
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    """Latency percentiles in milliseconds and documents per second"""
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1] * 1000,
+        'throughput_per_s': len(ordered) / elapsed if elapsed else 0.0
+    }
+
+
+def environment() -> dict:
+    """What a result was measured on, so results from different commits can be compared"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    }
+
+
+def parse_sizes(value: str) -> list:
+    return [int(size) for size in value.split(',') if size]
@@ -11,9 +11,43 @@ class FormType(Enum):
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here-change-in-production'
     UPLOAD_FOLDER = 'generated_docs'
+    # Internal state (job database and inputs, document index, caches, profiles); never served over HTTP
+    DATA_FOLDER = os.environ.get('DATA_FOLDER', 'instance')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
-    
+
+    # Directory for compiled Jinja2 template bytecode (disabled when unset)
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE')
+
     # Document Generation Settings
+    DOCX_TEMPLATE_FOLDER = 'docx_templates'  # Optional DOCX templates supplying styles and page setup
+    DOCX_BACKEND = os.environ.get('DOCX_BACKEND', 'python-docx')  # 'python-docx' or 'stream'
+    # Output formats whose backends are imported at startup instead of on first use, e.g. 'docx,pdf'
+    # so that workers forked from a preloaded app share them
+    PRELOAD_BACKENDS = [f for f in os.environ.get('PRELOAD_BACKENDS', '').split(',') if f]
+    # Output formats rendered once by the gunicorn warm-up hooks before the first request
+    WARM_UP_FORMATS = [f for f in os.environ.get('WARM_UP_FORMATS', 'docx,pdf,markdown,html').split(',') if f]
+    PDF_FONTS = {}  # TrueType fonts to register for PDF output, e.g. {'NotoSans': 'fonts/NotoSans-Regular.ttf'}
+    BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))  # Render processes per web/job process, shared by its batches; 1 renders in-process
+    BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 4))  # Rows sent to a render process per task
+    PREMIUM_INSTALMENTS = int(os.environ.get('PREMIUM_INSTALMENTS', 1))  # Instalments the premium is paid in; 1 is a lump sum before execution
+    DOCUMENT_CACHE_SIZE = int(os.environ.get('DOCUMENT_CACHE_SIZE', 64 * 1024 * 1024))  # Bytes of rendered documents kept in memory; 0 disables the cache
+    DOCUMENT_CACHE_DISK = os.environ.get('DOCUMENT_CACHE_DISK', '').lower() in ('1', 'true', 'yes')  # Also keep rendered documents under DATA_FOLDER/cache
+    JOB_DATABASE = os.environ.get('JOB_DATABASE', os.path.join(DATA_FOLDER, 'jobs.sqlite3'))  # Background job state
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))  # Job threads per web process; 0 leaves jobs to `python jobs.py`
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 600))  # Running jobs idle this long are picked up again
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))  # Threads running Flask requests under asgi.py
+    DOCUMENT_STORE_FOLDER = os.environ.get('DOCUMENT_STORE_FOLDER', os.path.join(UPLOAD_FOLDER, 'store'))  # Issued documents and job results, sharded by id
+    DOCUMENT_STORE_DATABASE = os.environ.get('DOCUMENT_STORE_DATABASE', os.path.join(DATA_FOLDER, 'documents.sqlite3'))  # Index of the document store, and archived documents
+    DOCUMENT_STORE_MAX_BYTES = int(os.environ.get('DOCUMENT_STORE_MAX_BYTES', 0))  # Oldest documents are removed beyond this; 0 keeps every issued license
+    DOCUMENT_STORE_MAX_AGE_DAYS = float(os.environ.get('DOCUMENT_STORE_MAX_AGE_DAYS', 0))  # Documents older than this are removed; 0 keeps them
+    DOCUMENT_STORE_ARCHIVE = os.environ.get('DOCUMENT_STORE_ARCHIVE', '').lower() in ('1', 'true', 'yes')  # Keep issued documents as their form data and re-render on download
+    DOCUMENT_STORE_COMPRESS = os.environ.get('DOCUMENT_STORE_COMPRESS', '1').lower() in ('1', 'true', 'yes')  # In archive mode, also keep compressed HTML/Markdown renders
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')  # Stage timings on /metrics and in Server-Timing headers
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')  # Admin token that turns on cProfile for a request (X-Profile-Token header)
+    PROFILE_MAX_PER_MINUTE = int(os.environ.get('PROFILE_MAX_PER_MINUTE', 6))  # Profiled requests allowed per process
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # Fraction of generation requests profiled without a token
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')  # Let Apache/lighttpd send download bodies
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX')  # Internal nginx location serving UPLOAD_FOLDER, e.g. /protected
     DOCUMENT_TYPES = {
         FormType.DHA_LICENSE_A: {
             'title': "DHA License 'A'",
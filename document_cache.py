@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from config import Config, FormType
+from document_generator import DocumentGeneratorFactory, OutputFormat, format_field
+from document_model import DOCUMENT_MODELS
+from template_registry import template_registry
+
+
+class CachedDocument:
+    """Rendered document bytes with the same response interface as a generator"""
+
+    def __init__(self, content: bytes, mimetype: str, extension: str):
+        self.content = content
+        self.mimetype = mimetype
+        self.extension = extension
+
+    def write(self, stream):
+        stream.write(self.content)
+
+    def to_bytes(self) -> bytes:
+        return self.content
+
+    def iter_chunks(self):
+        yield self.content
+
+
+class DocumentCache:
+    """Content-addressed cache of rendered documents in front of DocumentGeneratorFactory.
+
+    Documents are keyed by a hash of the form type, output format, the form
+    data as it is rendered, the execution date and the template version, so
+    a change to any template produces new keys instead of stale documents.
+    Recently used documents are kept in memory up to ``max_bytes``; with a
+    ``disk_dir``, every rendered document is also written there and read
+    back after it has been evicted from memory.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._size = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def template_version(self, form_type: FormType) -> str:
+        """Hash of everything a form type's documents are rendered from besides the form data"""
+        template = Config.DOCUMENT_TYPES.get(form_type, {}).get('template')
+        template_path = os.path.join(Config.DOCX_TEMPLATE_FOLDER, template) if template else None
+        template_mtime = os.path.getmtime(template_path) if template_path and os.path.exists(template_path) else None
+        revision = (template_registry.revision, template_mtime)
+        cached = self._versions.get(form_type)
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+
+        digest = hashlib.sha256(repr(DOCUMENT_MODELS.get(form_type)).encode('utf-8'))
+        digest.update(f"instalments={Config.PREMIUM_INSTALMENTS}".encode('utf-8'))
+        for output_format in OutputFormat:
+            digest.update(template_registry.source(form_type, output_format).encode('utf-8'))
+        if template_mtime is not None:
+            with open(template_path, 'rb') as f:
+                digest.update(f.read())
+        version = digest.hexdigest()
+        self._versions[form_type] = (revision, version)
+        return version
+
+    def key(self, form_type: FormType, output_format: OutputFormat, form_data: dict, current_date: datetime = None) -> str:
+        current_date = current_date or datetime.now()
+        normalized = {
+            'form_type': form_type.name,
+            'output_format': output_format.value,
+            'form_data': {name: format_field(value) for name, value in form_data.items()},
+            'execution_date': current_date.strftime('%Y-%m-%d'),
+            'version': self.template_version(form_type)
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key: str, extension: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.{extension}")
+
+    def _remember(self, key: str, document: CachedDocument):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = document
+            self._size += len(document.content)
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.content)
+                self.evictions += 1
+
+    def _read_disk(self, key: str, mimetype: str, extension: str):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key, extension), 'rb') as f:
+                return CachedDocument(f.read(), mimetype, extension)
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, document: CachedDocument):
+        path = self._disk_path(key, document.extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(document.content)
+            os.replace(temp_path, path)
+        except OSError:
+            os.unlink(temp_path)
+            raise
+
+    def render(self, form_type: FormType, form_data: dict, output_format: str = "docx"):
+        """Return the rendered document, rendering it only if no identical one is cached.
+
+        With the cache disabled the generator itself is returned; both offer
+        ``write``, ``to_bytes``, ``iter_chunks``, ``mimetype`` and ``extension``.
+        """
+        if not self.max_bytes and not self.disk_dir:
+            return DocumentGeneratorFactory.create_generator(form_type, form_data, output_format)
+        try:
+            format_enum = OutputFormat(output_format.lower())
+        except ValueError:
+            raise ValueError(f"Invalid output format: {output_format}. Supported formats are: {', '.join([f.value for f in OutputFormat])}")
+        key = self.key(form_type, format_enum, form_data)
+
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return document
+
+        generator = DocumentGeneratorFactory.create_generator(form_type, form_data, output_format)
+        document = self._read_disk(key, generator.mimetype, generator.extension)
+        if document is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            document = CachedDocument(generator.to_bytes(), generator.mimetype, generator.extension)
+            if self.disk_dir:
+                self._write_disk(key, document)
+        self._remember(key, document)
+        return document
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+document_cache = DocumentCache(
+    Config.DOCUMENT_CACHE_SIZE,
+    os.path.join(Config.DATA_FOLDER, 'cache') if Config.DOCUMENT_CACHE_DISK else None
+)
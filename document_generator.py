@@ -1,20 +1,19 @@
-from docx import Document
-from docx.shared import Pt, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 from datetime import datetime
 from config import FormType, Config
 import os
+import io
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from abc import ABC, abstractmethod
-import markdown
-import jinja2
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+from html import escape as html_escape
+from template_registry import template_registry
+from metrics import metrics
+from number_words import ordinal, year_to_words
+from fees import fee_context
+from zip_stream import ZipStreamWriter
+from document_model import BlockKind, Text, DOCUMENT_MODELS
 
 class OutputFormat(Enum):
     DOCX = "docx"
@@ -22,330 +21,17 @@ class OutputFormat(Enum):
     MARKDOWN = "markdown"
     HTML = "html"
 
-class BaseDocumentGenerator(ABC):
-    def __init__(self, form_data: dict):
-        self.form_data = form_data
-        self.year_words = {
-            "2024": "twenty four",
-            "2025": "twenty five",
-            "2026": "twenty six",
-            "2027": "twenty seven",
-            "2028": "twenty eight",
-            "2029": "twenty nine",
-            "2030": "thirty"
-        }
-        self.current_date = datetime.now()
-        self.year_in_words = self.year_words.get(str(self.current_date.year), "")
-    
-    @abstractmethod
-    def generate(self):
-        pass
-    
-    @abstractmethod
-    def save(self, output_path: str):
-        pass
-
-class DocxGenerator(BaseDocumentGenerator):
-    def __init__(self, form_data: dict):
-        super().__init__(form_data)
-        self.document = Document()
-        self._setup_document()
-    
-    def _setup_document(self):
-        sections = self.document.sections
-        for section in sections:
-            section.top_margin = Inches(1)
-            section.bottom_margin = Inches(1)
-            section.left_margin = Inches(1)
-            section.right_margin = Inches(1)
-    
-    def _add_heading(self, text: str, level: int = 1, alignment: WD_ALIGN_PARAGRAPH = WD_ALIGN_PARAGRAPH.CENTER):
-        heading = self.document.add_heading('', level=level)
-        heading.alignment = alignment
-        run = heading.add_run(text)
-        run.font.size = Pt(12)
-        return heading
-    
-    def _add_paragraph(self, text: str, alignment: WD_ALIGN_PARAGRAPH = WD_ALIGN_PARAGRAPH.JUSTIFY):
-        paragraph = self.document.add_paragraph(text)
-        paragraph.alignment = alignment
-        for run in paragraph.runs:
-            run.font.size = Pt(12)
-        return paragraph
-
-    def generate(self) -> str:
-        # Title section
-        self._add_paragraph("R e s i d e n t i a l").alignment = WD_ALIGN_PARAGRAPH.CENTER
-        self._add_paragraph("Pakistan Defence Officers Housing Authority").alignment = WD_ALIGN_PARAGRAPH.CENTER
-        self._add_paragraph("K a r a c h i").alignment = WD_ALIGN_PARAGRAPH.CENTER
-        self._add_paragraph("Licence – 'a'").alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add divider lines
-        self._add_paragraph("-" * 75).alignment = WD_ALIGN_PARAGRAPH.CENTER
-        self._add_paragraph("")
-        self._add_paragraph("-" * 75).alignment = WD_ALIGN_PARAGRAPH.CENTER
-        self._add_paragraph("")
-        self._add_paragraph("")
-        
-        # Repeat header
-        self._add_paragraph("Pakistan Defence Officers Housing Authority").alignment = WD_ALIGN_PARAGRAPH.CENTER
-        self._add_paragraph("K a r a c h i").alignment = WD_ALIGN_PARAGRAPH.CENTER
-        self._add_paragraph("Licence 'a'").alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add main content
-        self._add_paragraph(f"""THIS INDENTURE made this {self.current_date.strftime('%d')}th day of {self.current_date.strftime('%B')} (in the year two thousand and {self.year_in_words}) BETWEEN the Pakistan Defence Officers Housing Authority established under Article 4 of Pakistan Defence Officers Housing Authority Order, 1980, having its office at Korangi Road, Karachi (hereinafter called the "1st Party") AND {self.form_data['licensee_name']}\n{self.form_data['licensee_address']}\n(hereinafter called the "Licensee-2nd Party". The terms 1st Party and 2nd Party shall include their respective executors, successors-in-interest and assigns).""")
-        
-        # Add KPT details
-        self._add_paragraph(f"""WHEREAS the (KPT) Karachi Port Trust (hereinafter referred to as the lessor) through a deed registered in the office of the Sub-Registrar {self.form_data['sub_registrar']} Town, Karachi, as No {self.form_data['kpt_book_no']} Book-I dated {self.form_data['kpt_book_date'].strftime('%d-%m-%Y')}, M.F. Roll No.{self.form_data['kpt_mf_roll_no']} dated {self.form_data['kpt_mf_roll_date'].strftime('%d-%m-%Y')} admeasuring ­­­­­­­{self.form_data['land_size']} acres, had authorised the Pakistan Defence Officers Housing Authority, Karachi (hereinafter called the Authority) to enter upon the entire area of land shown in the plan attached to the lease including the plot referred to hereinafter for the purpose of developing it and for the construction of building, possession whereof had already been taken over by the Authority subject to, the terms and conditions contained in the Agreement;""")
-        
-        # Add possession clause
-        self._add_paragraph(f"""AND WHEREAS the 1st Party now being fully entitled to seize and well possessed of all the piece and parcel of land measuring {self.form_data['land_size']} acres of land in Deh {self.form_data['deh']} bearing survey sheet No. {self.form_data['survey_sheet_number']} and fully described in the Schedule hereunder and fully competent and legally entitled as owners to allot the same.""")
-        
-        # Add transfer clause
-        self._add_paragraph(f"""AND WHEREAS the licensee has been allotted / transferred vide allotment / transfer order No {self.form_data['transfer_order_no']} dated {self.form_data['transfer_order_date'].strftime('%d-%m-%Y')} the plot bearing No. {self.form_data['plot_number']} Survey Sheet No.{self.form_data['survey_sheet_number']} in the territorial division of {self.form_data['territorial_division']} Police Station in the layout plan of the entire area measuring {self.form_data['land_size']} acres as shown in the Schedule hereunder.""")
-        
-        # Add page number
-        self._add_paragraph("2").alignment = WD_ALIGN_PARAGRAPH.LEFT
-        
-        # Add license clause
-        self._add_paragraph("AND WHEREAS under the licence the 2nd Party is entitled to enter upon the said plot of land for the purpose of constructing a building thereon.")
-        
-        # Add witnesseth clause
-        self._add_paragraph("NOW THIS INDENTURE WITNESSETH as follows :--")
-        
-        # Add numbered clauses
-        self._add_paragraph("1.\tThat the 1st Party do hereby authorise and permit the 2nd Party to enter upon the said plot of land for the purpose of constructing a building thereon in accordance with the terms and conditions hereinafter following :--")
-        
-        # Add subclauses
-        subclauses = [
-            "(i)\tThe 2nd Party shall at his own cost and within the period of 2 years from the date of execution of this licence erect, complete and finish upon the said plot a residential house in accordance with the plan and design approved by the competent authority (hereinafter called the \"Authority\") subject to the condition that no construction work shall be started by the 2nd Party on his plot unless the preliminary stages of development shall have been completed and permission in writing shall have been obtained from the Authority. In the event of the licensee failing to comply with the conditions hereinafter appearing the 1st Party may at his discretion recover from the 2nd Party as agreed liquidated damages and not by way of penalty a sum equal to half per sent of the estimated cost of work remaining incomplete for every month the work remains incomplete subject to maximum of 5 per cent of the estimated cost of the work remaining un-finished after the due date. Provided that if the licensee fails to complete and finish the building by the date finally fixed by the Authority, the 1st Party may terminate this licence and resume the plot and any structures erected thereon.",
-            "(ii)\tThe construction shall be done in accordance with the building bye-laws and the rules laid down by the Authority (1st Party).",
-            "(iii)\tWith the execution of these presents the rights and liabilities accrued under this instrument shall devolve upon the 2nd Party and he shall be bound by such terms and conditions of the licence as are expressly or by necessary implication or analogy applicable to him.",
-            "(iv)\tThis is a licence with permission to build and occupy. After the completion of the building a proper lease will be given to the Licensee for a period of 99 years by the (1st Party) on such terms and conditions as they deem necessary or may be imposed by the Government or any other Authority.",
-            "(v)\tThe Licensee shall deposit with any scheduled bank duly authorised by the 1st Party or with the 1st Party :",
-            f"(a)\tThe amount at the rate of Rs.{self.form_data['premium_rate']} per square yard to be paid in lump sum before execution of this licence agreement towards the premium of the plot.",
-            f"(b)\tThe ground rent is payable in advance on or before the first day of July every year at the rate of {self.form_data['ground_rent_rate']} paisas per square yard per annum. The first payment shall be made on the first day of July, next following the day when the licensee takes possession of the plot allotted/transferred to him/her,",
-            "(vi)\tThe 2nd Party shall pay all the calls (hereinafter called the \"development charges\") levied by the 1st Party from time to time at their office for an amount equal to the proportion of expenses to be incurred by the (1st Party) on the execution and completion of the development schemes. The decision of the Executive Board of the 1st Party as to the amount so payable shall be final and binding on the licensee."
-        ]
-        
-        for subclause in subclauses:
-            self._add_paragraph(subclause)
-        
-        # Add page 3
-        self._add_paragraph("3").alignment = WD_ALIGN_PARAGRAPH.LEFT
-        
-        # Additional clauses
-        self._add_paragraph("(vii)\tAll arrears of payments due and payable by the Licensee shall be recoverable as arrears of land revenues.")
-        
-        self._add_paragraph("2.\tIt is hereby agreed that on the completion of the building in accordance with the said terms and conditions and on the licensee complying with the said rules he shall be entitled to a lease of the said plot for 99 years in the form prescribed by the Executive Board of the 1st Party and IT IS HEREBY FURTHER AGREED that until such lease has been granted by the (1st Party) the licensee shall not have any right or interest in the said plot except that of a bare licensee and shall not without the previous permission in writing of the (1st Party) transfer his interest in the area allotted to him either in part or whole except for the purpose of raising loans from the House Building Finance Corporation, authorised banks and insurance companies for construction of building thereon.")
-        
-        self._add_paragraph("3.\tShould the licensee commit breach of any of the terms and conditions of these presents or should he neglect to comply with any direction given to him by the 1st Party or in any other respect fail to carry out his obligations under these presents for reasons not beyond his control or fail to pay development charges or other dues, the 1st Party shall have the right to terminate this licence and on such termination the payment made by him to the 1st Party shall be forfeited and he shall have no further claim whatsoever against the 1st Party except at the option of 1st Party he may receive compensation to the extent of the amount of actual expenditure incurred by him on the plot.")
-        
-        self._add_paragraph("Provided that the 1st Party may in his absolute discretion have the building sold out either by public auction or private contract, in which case the licensee shall be entitled to the net sale proceeds of the building or to the amount of actual expenditure incurred by him on having the building constructed whichever is less.")
-        
-        # Add schedule
-        schedule_heading = "THE SCHEDULE ABOVE REFERRED TO"
-        self._add_paragraph(schedule_heading).alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        schedule = f"""ALL that piece and parcel of land measuring {self.form_data['plot_area']} square yards bearing Plot No {self.form_data['plot_number']} and bounded
-North................... {self.form_data['north_boundary']}
-South ................{self.form_data['south_boundary']}
-East................... {self.form_data['east_boundary']}
-West................... {self.form_data['west_boundary']}
-Situated in Police Station {self.form_data['police_station']}"""
-        
-        self._add_paragraph(schedule)
-        
-        # Add page 4
-        self._add_paragraph("4").alignment = WD_ALIGN_PARAGRAPH.LEFT
-        
-        # Add empty lines
-        for _ in range(3):
-            self._add_paragraph("")
-        
-        # Add signature section
-        sec_sign = """SIGNED by the Secretary, Pakistan\t\t\t\t    …………………………………………...
-Defence Officers Housing Authority Karachi.\t\t\t               Signature of the Secretary
-In the presence of :\t\t\t\t\t\t                 1st Party"""
-        
-        self._add_paragraph(sec_sign)
-        
-        self._add_paragraph("1.")
-        self._add_paragraph("")
-        self._add_paragraph("")
-        self._add_paragraph("2.")
-        self._add_paragraph("")
-        self._add_paragraph("")
-        self._add_paragraph("\t\t\t\t\t\t    …………………………………………...\n\t\t\t\t\t\t\t\t Member Executive Board")
-        
-        for _ in range(5):
-            self._add_paragraph("")
-        
-        # Add witness section
-        witness_sec = f"""SIGNED by the above named\t\t\t\t    …………………………………………...
-Licensee – 2nd Party in the\t\t\t\t\t        Licensee / 2nd Party
-Presence of :
-Witness: (1)  Signature:……………………………..
-\tName: {self.form_data['witness1_name']}
-\tAddress: {self.form_data['witness1_address']}
-\tCNIC #: {self.form_data['witness1_cnic']}
-
-
-  (2)  Signature:……………………………..
-\tName: {self.form_data['witness2_name']}
-\tAddress: {self.form_data['witness2_address']}
-\tCNIC #: {self.form_data['witness2_cnic']}"""
-        
-        self._add_paragraph(witness_sec)
-        
-        return ""
-    
-    def save(self, output_path: str):
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        self.document.save(output_path)
-        
-        
-class MarkdownGenerator(BaseDocumentGenerator):
-    def generate(self) -> str:
-        template = """
-# R e s i d e n t i a l
-
-# Pakistan Defence Officers Housing Authority
-# K a r a c h i
-
-# Licence – 'a'
-
-
-
-
--------------------
-
-
--------------------
-
-
-
-
-
-
-
-
-# Pakistan Defence Officers Housing Authority
-# K a r a c h i
-
-# Licence 'a'
-
-THIS INDENTURE made this {{current_date}} BETWEEN the Pakistan Defence Officers Housing Authority established under Article 4 of Pakistan Defence Officers Housing Authority Order, 1980, having its office at Korangi Road, Karachi (hereinafter called the "1st Party") AND {{licensee_name}}  
-{{licensee_address}}  
-(hereinafter called the "Licensee-2nd Party". The terms 1st Party and 2nd Party shall include their respective executors, successors-in-interest and assigns).
-
-WHEREAS the (KPT) Karachi Port Trust (hereinafter referred to as the lessor) through a deed registered in the office of the Sub-Registrar {{sub_registrar}} Town, Karachi, as No {{kpt_book_no}} Book-I dated {{kpt_book_date}}, M.F. Roll No.{{kpt_mf_roll_no}} dated {{kpt_mf_roll_date}} admeasuring {{land_size}} acres, had authorised the Pakistan Defence Officers Housing Authority, Karachi (hereinafter called the Authority) to enter upon the entire area of land shown in the plan attached to the lease including the plot referred to hereinafter for the purpose of developing it and for the construction of building, possession whereof had already been taken over by the Authority subject to, the terms and conditions contained in the Agreement;
-
-AND WHEREAS the 1st Party now being fully entitled to seize and well possessed of all the piece and parcel of land measuring {{land_size}} acres of land in Deh {{deh}} bearing survey sheet No. {{survey_sheet_number}} and fully described in the Schedule hereunder and fully competent and legally entitled as owners to allot the same.
-
-AND WHEREAS the licensee has been allotted / transferred vide allotment / transfer order No {{transfer_order_no}} dated {{transfer_order_date}} the plot bearing No. {{plot_number}} Survey Sheet No.{{survey_sheet_number}} in the territorial division of {{territorial_division}} Police Station in the layout plan of the entire area measuring {{land_size}} acres as shown in the Schedule hereunder.
-
-# 2
-
-AND WHEREAS under the licence the 2nd Party is entitled to enter upon the said plot of land for the purpose of constructing a building thereon.
-
-NOW THIS INDENTURE WITNESSETH as follows :--
-
-1. That the 1st Party do hereby authorise and permit the 2nd Party to enter upon the said plot of land for the purpose of constructing a building thereon in accordance with the terms and conditions hereinafter following :--
-
-    (i) The 2nd Party shall at his own cost and within the period of 2 years from the date of execution of this licence erect, complete and finish upon the said plot a residential house in accordance with the plan and design approved by the competent authority (hereinafter called the "Authority") subject to the condition that no construction work shall be started by the 2nd Party on his plot unless the preliminary stages of development shall have been completed and permission in writing shall have been obtained from the Authority. In the event of the licensee failing to comply with the conditions hereinafter appearing the 1st Party may at his discretion recover from the 2nd Party as agreed liquidated damages and not by way of penalty a sum equal to half per sent of the estimated cost of work remaining incomplete for every month the work remains incomplete subject to maximum of 5 per cent of the estimated cost of the work remaining un-finished after the due date. Provided that if the licensee fails to complete and finish the building by the date finally fixed by the Authority, the 1st Party may terminate this licence and resume the plot and any structures erected thereon.
-
-    (ii) The construction shall be done in accordance with the building bye-laws and the rules laid down by the Authority (1st Party).
-
-    (iii) With the execution of these presents the rights and liabilities accrued under this instrument shall devolve upon the 2nd Party and he shall be bound by such terms and conditions of the licence as are expressly or by necessary implication or analogy applicable to him.
-
-    (iv) This is a licence with permission to build and occupy. After the completion of the building a proper lease will be given to the Licensee for a period of 99 years by the (1st Party) on such terms and conditions as they deem necessary or may be imposed by the Government or any other Authority.
-
-    (v) The Licensee shall deposit with any scheduled bank duly authorised by the 1st Party or with the 1st Party :
-
-    (a) The amount at the rate of Rs.{{premium_rate}} per square yard to be paid in lump sum before execution of this licence agreement towards the premium of the plot.
-
-    (b) The ground rent is payable in advance on or before the first day of July every year at the rate of {{ground_rent_rate}} paisas per square yard per annum. The first payment shall be made on the first day of July, next following the day when the licensee takes possession of the plot allotted/transferred to him/her,
-
-    (vi) The 2nd Party shall pay all the calls (hereinafter called the "development charges") levied by the 1st Party from time to time at their office for an amount equal to the proportion of expenses to be incurred by the (1st Party) on the execution and completion of the development schemes. The decision of the Executive Board of the 1st Party as to the amount so payable shall be final and binding on the licensee.
-
-# 3
-
-(vii) All arrears of payments due and payable by the Licensee shall be recoverable as arrears of land revenues.
-
-2. It is hereby agreed that on the completion of the building in accordance with the said terms and conditions and on the licensee complying with the said rules he shall be entitled to a lease of the said plot for 99 years in the form prescribed by the Executive Board of the 1st Party and IT IS HEREBY FURTHER AGREED that until such lease has been granted by the (1st Party) the licensee shall not have any right or interest in the said plot except that of a bare licensee and shall not without the previous permission in writing of the (1st Party) transfer his interest in the area allotted to him either in part or whole except for the purpose of raising loans from the House Building Finance Corporation, authorised banks and insurance companies for construction of building thereon.
-
-3. Should the licensee commit breach of any of the terms and conditions of these presents or should he neglect to comply with any direction given to him by the 1st Party or in any other respect fail to carry out his obligations under these presents for reasons not beyond his control or fail to pay development charges or other dues, the 1st Party shall have the right to terminate this licence and on such termination the payment made by him to the 1st Party shall be forfeited and he shall have no further claim whatsoever against the 1st Party except at the option of 1st Party he may receive compensation to the extent of the amount of actual expenditure incurred by him on the plot.
-
-Provided that the 1st Party may in his absolute discretion have the building sold out either by public auction or private contract, in which case the licensee shall be entitled to the net sale proceeds of the building or to the amount of actual expenditure incurred by him on having the building constructed whichever is less.
-
-
-# THE SCHEDULE ABOVE REFERRED TO
-
-
-ALL that piece and parcel of land measuring {{plot_area}} square yards bearing Plot No {{plot_number}} and bounded  
-North................... {{north_boundary}}  
-South ................{{south_boundary}}  
-East................... {{east_boundary}}  
-West................... {{west_boundary}}  
-Situated in Police Station {{police_station}}
-
-# 4
-
-
-
-
-
-
-SIGNED by the Secretary, Pakistan                    …………………………………………...  
-Defence Officers Housing Authority Karachi.                      Signature of the Secretary  
-In the presence of :                                             1st Party  
-
-1.
-
-
-
-2.
+DIVIDER = "-" * 75
+SIGNATURE_COLUMN = 60  # Character column of right-hand signature text in plain-text formats
+TEMPLATE_STREAM_BUFFER = 16  # Template events joined into each chunk of a streamed text response
 
+# Modules implementing the formats whose libraries are slow to import; loaded on first use
+BACKEND_MODULES = {
+    OutputFormat.DOCX: 'docx_generator',
+    OutputFormat.PDF: 'pdf_generator'
+}
 
-                                            …………………………………………...  
-                                                     Member Executive Board  
-
-
-
-
-
-
-
-
-
-
-
-SIGNED by the above named                            …………………………………………...  
-Licensee – 2nd Party in the                                 Licensee / 2nd Party  
-Presence of :  
-Witness: (1)  Signature:……………………………..  
-        Name: {{witness1_name}}  
-        Address: {{witness1_address}}  
-        CNIC #: {{witness1_cnic}}  
-
-
-  (2)  Signature:……………………………..  
-        Name: {{witness2_name}}  
-        Address: {{witness2_address}}  
-        CNIC #: {{witness2_cnic}}  
-"""
-        return jinja2.Template(template).render(**self.form_data, current_date=self.current_date.strftime('%d %B %Y'))
-    
-    def save(self, output_path: str):
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'w') as f:
-            f.write(self.generate())
-
-class HtmlGenerator(BaseDocumentGenerator):
-    def generate(self) -> str:
-        template = """
-<!DOCTYPE html>
+HTML_HEAD = """<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -420,20 +106,9 @@ class HtmlGenerator(BaseDocumentGenerator):
             white-space: pre-wrap;
             font-size: 12px;
         }
-        .witness-section {
-            margin-top: 30px;
-            white-space: pre-wrap;
-            font-size: 12px;
-        }
         .page-break {
             page-break-before: always;
         }
-        .spacer {
-            height: 48px;
-        }
-        .big-spacer {
-            height: 72px;
-        }
         @media print {
             body { font-size: 12pt; }
             .page-break { page-break-before: always; }
@@ -441,394 +116,258 @@ class HtmlGenerator(BaseDocumentGenerator):
     </style>
 </head>
 <body>
-    <div class="title">R e s i d e n t i a l</div>
-    <div class="spacer"></div>
-    <div class="title">Pakistan Defence Officers Housing Authority</div>
-    <div class="title">K a r a c h i</div>
-    <div class="title">Licence – 'a'</div>
-    <div class="spacer"></div>
-    <div class="divider">---------------------------------------------------------------------------</div>
-    <div class="spacer"></div>
-    <div class="divider">---------------------------------------------------------------------------</div>
-    <div class="big-spacer"></div>
-    <div class="title">Pakistan Defence Officers Housing Authority</div>
-    <div class="title">K a r a c h i</div>
-    <div class="title">Licence 'a'</div>
-    
-    <div class="content">
-        THIS INDENTURE made this {{current_date}} BETWEEN the Pakistan Defence Officers Housing Authority established under Article 4 of Pakistan Defence Officers Housing Authority Order, 1980, having its office at Korangi Road, Karachi (hereinafter called the "1st Party") AND {{licensee_name}}<br>
-        {{licensee_address}}<br>
-        (hereinafter called the "Licensee-2nd Party". The terms 1st Party and 2nd Party shall include their respective executors, successors-in-interest and assigns).
-    </div>
-    
-    <div class="content">
-        WHEREAS the (KPT) Karachi Port Trust (hereinafter referred to as the lessor) through a deed registered in the office of the Sub-Registrar {{sub_registrar}} Town, Karachi, as No {{kpt_book_no}} Book-I dated {{kpt_book_date}}, M.F. Roll No.{{kpt_mf_roll_no}} dated {{kpt_mf_roll_date}} admeasuring {{land_size}} acres, had authorised the Pakistan Defence Officers Housing Authority, Karachi (hereinafter called the Authority) to enter upon the entire area of land shown in the plan attached to the lease including the plot referred to hereinafter for the purpose of developing it and for the construction of building, possession whereof had already been taken over by the Authority subject to, the terms and conditions contained in the Agreement;
-    </div>
-
-    <div class="content">
-        AND WHEREAS the 1st Party now being fully entitled to seize and well possessed of all the piece and parcel of land measuring {{land_size}} acres of land in Deh {{deh}} bearing survey sheet No. {{survey_sheet_number}} and fully described in the Schedule hereunder and fully competent and legally entitled as owners to allot the same.
-    </div>
-
-    <div class="content">
-        AND WHEREAS the licensee has been allotted / transferred vide allotment / transfer order No {{transfer_order_no}} dated {{transfer_order_date}} the plot bearing No. {{plot_number}} Survey Sheet No.{{survey_sheet_number}} in the territorial division of {{territorial_division}} Police Station in the layout plan of the entire area measuring {{land_size}} acres as shown in the Schedule hereunder.
-    </div>
-
-    <div class="page-break"></div>
-    
-    <div class="content">
-        AND WHEREAS under the licence the 2nd Party is entitled to enter upon the said plot of land for the purpose of constructing a building thereon.
-    </div>
-
-    <div class="content">
-        NOW THIS INDENTURE WITNESSETH as follows :--
-    </div>
-
-    <div class="clause">
-        1. That the 1st Party do hereby authorise and permit the 2nd Party to enter upon the said plot of land for the purpose of constructing a building thereon in accordance with the terms and conditions hereinafter following :--
-    </div>
-
-    <div class="subclause">
-        (i) The 2nd Party shall at his own cost and within the period of 2 years from the date of execution of this licence erect, complete and finish upon the said plot a residential house in accordance with the plan and design approved by the competent authority (hereinafter called the "Authority") subject to the condition that no construction work shall be started by the 2nd Party on his plot unless the preliminary stages of development shall have been completed and permission in writing shall have been obtained from the Authority. In the event of the licensee failing to comply with the conditions hereinafter appearing the 1st Party may at his discretion recover from the 2nd Party as agreed liquidated damages and not by way of penalty a sum equal to half per sent of the estimated cost of work remaining incomplete for every month the work remains incomplete subject to maximum of 5 per cent of the estimated cost of the work remaining un-finished after the due date. Provided that if the licensee fails to complete and finish the building by the date finally fixed by the Authority, the 1st Party may terminate this licence and resume the plot and any structures erected thereon.
-    </div>
-
-    <div class="subclause">
-        (ii) The construction shall be done in accordance with the building bye-laws and the rules laid down by the Authority (1st Party).
-    </div>
-
-    <div class="subclause">
-        (iii) With the execution of these presents the rights and liabilities accrued under this instrument shall devolve upon the 2nd Party and he shall be bound by such terms and conditions of the licence as are expressly or by necessary implication or analogy applicable to him.
-    </div>
-
-    <div class="subclause">
-        (iv) This is a licence with permission to build and occupy. After the completion of the building a proper lease will be given to the Licensee for a period of 99 years by the (1st Party) on such terms and conditions as they deem necessary or may be imposed by the Government or any other Authority.
-    </div>
-
-    <div class="subclause">
-        (v) The Licensee shall deposit with any scheduled bank duly authorised by the 1st Party or with the 1st Party :
-    </div>
-
-    <div class="subclause">
-        (a) The amount at the rate of Rs.{{premium_rate}} per square yard to be paid in lump sum before execution of this licence agreement towards the premium of the plot.
-    </div>
-
-    <div class="subclause">
-        (b) The ground rent is payable in advance on or before the first day of July every year at the rate of {{ground_rent_rate}} paisas per square yard per annum. The first payment shall be made on the first day of July, next following the day when the licensee takes possession of the plot allotted/transferred to him/her,
-    </div>
+"""
 
-    <div class="subclause">
-        (vi) The 2nd Party shall pay all the calls (hereinafter called the "development charges") levied by the 1st Party from time to time at their office for an amount equal to the proportion of expenses to be incurred by the (1st Party) on the execution and completion of the development schemes. The decision of the Executive Board of the 1st Party as to the amount so payable shall be final and binding on the licensee.
-    </div>
+def format_field(value) -> str:
+    """The text a form value is rendered as in every output format"""
+    return value.strftime('%d-%m-%Y') if hasattr(value, 'strftime') else str(value)
 
-    <div class="page-break"></div>
+class BaseDocumentGenerator(ABC):
+    mimetype = 'application/octet-stream'
+    extension = ''
+    output_format = None
 
-    <div class="subclause">
-        (vii) All arrears of payments due and payable by the Licensee shall be recoverable as arrears of land revenues.
-    </div>
+    def __init__(self, form_data: dict, form_type: FormType = FormType.DHA_LICENSE_A, context: dict = None):
+        self.form_data = form_data
+        self.form_type = form_type
+        self.model = DOCUMENT_MODELS[form_type]
+        self.current_date = datetime.now()
+        # Generators rendering the same form data in other formats may share one context
+        self.context = context if context is not None else self._build_context()
+
+    def _build_context(self) -> dict:
+        """Format the form data, execution date and fees as the strings substituted into the model's fields"""
+        context = {name: format_field(value) for name, value in self.form_data.items()}
+        context['execution_day'] = ordinal(self.current_date.day)
+        context['execution_month'] = self.current_date.strftime('%B')
+        context['execution_year_words'] = year_to_words(self.current_date.year)
+        context.update(fee_context(self.form_data, Config.PREMIUM_INSTALMENTS))
+        return context
 
-    <div class="clause">
-        2. It is hereby agreed that on the completion of the building in accordance with the said terms and conditions and on the licensee complying with the said rules he shall be entitled to a lease of the said plot for 99 years in the form prescribed by the Executive Board of the 1st Party and IT IS HEREBY FURTHER AGREED that until such lease has been granted by the (1st Party) the licensee shall not have any right or interest in the said plot except that of a bare licensee and shall not without the previous permission in writing of the (1st Party) transfer his interest in the area allotted to him either in part or whole except for the purpose of raising loans from the House Building Finance Corporation, authorised banks and insurance companies for construction of building thereon.
-    </div>
+    @abstractmethod
+    def generate(self):
+        pass
 
-    <div class="clause">
-        3. Should the licensee commit breach of any of the terms and conditions of these presents or should he neglect to comply with any direction given to him by the 1st Party or in any other respect fail to carry out his obligations under these presents for reasons not beyond his control or fail to pay development charges or other dues, the 1st Party shall have the right to terminate this licence and on such termination the payment made by him to the 1st Party shall be forfeited and he shall have no further claim whatsoever against the 1st Party except at the option of 1st Party he may receive compensation to the extent of the amount of actual expenditure incurred by him on the plot.
-    </div>
+    @abstractmethod
+    def write(self, stream):
+        """Render the complete document into a binary stream"""
+        pass
 
-    <div class="content">
-        Provided that the 1st Party may in his absolute discretion have the building sold out either by public auction or private contract, in which case the licensee shall be entitled to the net sale proceeds of the building or to the amount of actual expenditure incurred by him on having the building constructed whichever is less.
-    </div>
+    def _timer(self, stage: str):
+        """Record the time taken by a stage of rendering, when metrics are enabled"""
+        return metrics.timer(stage, self.form_type, self.output_format)
 
-    <div class="title">THE SCHEDULE ABOVE REFERRED TO</div>
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        self.write(buffer)
+        return buffer.getvalue()
 
-    <div class="schedule-content">
-ALL that piece and parcel of land measuring {{plot_area}} square yards bearing Plot No {{plot_number}} and bounded
-North................... {{north_boundary}}
-South ................{{south_boundary}}
-East................... {{east_boundary}}
-West................... {{west_boundary}}
-Situated in Police Station {{police_station}}
-    </div>
+    def iter_chunks(self):
+        """Yield the rendered document as byte chunks for a streamed response"""
+        yield self.to_bytes()
 
-    <div class="page-break"></div>
-    <div class="big-spacer"></div>
+    def save(self, output_path: str):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'wb') as f:
+            self.write(f)
+
+class StaticBlockCache:
+    """Pre-rendered output for the blocks of a model that do not depend on form data.
+
+    Each renderer keeps one cache; the first generator for a form type renders
+    the static blocks and later generators reuse them, so a request only builds
+    the blocks that contain fields.
+    """
+
+    def __init__(self):
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def get(self, form_type: FormType, model: tuple, render) -> tuple:
+        """Return one entry per block: the pre-rendered output, or None for blocks with fields"""
+        rendered = self._rendered.get(form_type)
+        if rendered is None:
+            with self._lock:
+                rendered = self._rendered.get(form_type)
+                if rendered is None:
+                    rendered = tuple(render(block) if block.is_static else None for block in model)
+                    self._rendered[form_type] = rendered
+        return rendered
+
+def _row_source(row, text_source) -> str:
+    """Lay out a signature row as plain text, padding to the right-hand column"""
+    line = "    " * row.indent + text_source(row.left)
+    if row.right:
+        line = line.ljust(SIGNATURE_COLUMN) + row.right
+    return line
 
-    <div class="signature-section">
-SIGNED by the Secretary, Pakistan                    …………………………………………...
-Defence Officers Housing Authority Karachi.                      Signature of the Secretary
-In the presence of :                                             1st Party
+class MarkdownGenerator(BaseDocumentGenerator):
+    mimetype = 'text/markdown'
+    extension = 'md'
+    output_format = OutputFormat.MARKDOWN
 
-1.
+    @staticmethod
+    def _text_source(nodes: tuple) -> str:
+        return ''.join(
+            node.value.replace('\n', '  \n') if type(node) is Text else f"{{{{ {node.name}|md_breaks }}}}"
+            for node in nodes
+        )
 
+    @classmethod
+    def _block_source(cls, block) -> str:
+        kind = block.kind
+        text = cls._text_source(block.segments)
+        if kind == BlockKind.SPACER:
+            return ""
+        elif kind in (BlockKind.TITLE, BlockKind.HEADING):
+            return f"# {text}"
+        elif kind == BlockKind.DIVIDER:
+            return DIVIDER
+        elif kind == BlockKind.PAGE_BREAK:
+            return f"# {block.label}"
+        elif kind == BlockKind.CLAUSE:
+            return f"{block.label} {text}"
+        elif kind == BlockKind.SUBCLAUSE:
+            return f"    {block.label} {text}"
+        elif kind == BlockKind.SIGNATURE:
+            return '\n'.join(_row_source(row, cls._text_source).rstrip() + "  " for row in block.rows)
+        return text
+
+    @classmethod
+    def template_source(cls, model: tuple) -> str:
+        """Build the Jinja2 template for a document model"""
+        return '\n\n'.join(cls._block_source(block) for block in model) + '\n'
 
+    def generate(self) -> str:
+        template = template_registry.get(self.form_type, OutputFormat.MARKDOWN)
+        return template.render(**self.context)
 
-2.
+    def iter_chunks(self):
+        stream = template_registry.get(self.form_type, OutputFormat.MARKDOWN).stream(**self.context)
+        stream.enable_buffering(TEMPLATE_STREAM_BUFFER)
+        for chunk in stream:
+            yield chunk.encode('utf-8')
 
+    def write(self, stream):
+        with self._timer('generate'):
+            stream.writelines(self.iter_chunks())
 
-                                            …………………………………………...
-                                                     Member Executive Board
-    </div>
+class HtmlGenerator(BaseDocumentGenerator):
+    mimetype = 'text/html'
+    extension = 'html'
+    output_format = OutputFormat.HTML
+    BLOCK_CLASSES = {
+        BlockKind.TITLE: "title",
+        BlockKind.HEADING: "title",
+        BlockKind.BODY: "content",
+        BlockKind.CLAUSE: "clause",
+        BlockKind.SUBCLAUSE: "subclause",
+        BlockKind.SCHEDULE: "schedule-content",
+        BlockKind.SIGNATURE: "signature-section"
+    }
 
-    <div class="big-spacer"></div>
-    <div class="big-spacer"></div>
-    <div class="witness-section">
-        SIGNED by the above named                            …………………………………………...
-        Licensee – 2nd Party in the                                 Licensee / 2nd Party
-        Presence of :
-        Witness: (1)  Signature:……………………………..
-                      Name: {{witness1_name}}
-                      Address: {{witness1_address}}
-                      CNIC #: {{witness1_cnic}}
+    @staticmethod
+    def _text_source(nodes: tuple, preformatted: bool = False) -> str:
+        if preformatted:
+            return ''.join(
+                html_escape(node.value, quote=False) if type(node) is Text else f"{{{{ {node.name} }}}}"
+                for node in nodes
+            )
+        return ''.join(
+            html_escape(node.value, quote=False).replace('\n', '<br>\n') if type(node) is Text
+            else f"{{{{ {node.name}|nl2br }}}}"
+            for node in nodes
+        )
 
+    @classmethod
+    def _block_source(cls, block) -> str:
+        kind = block.kind
+        if kind == BlockKind.SPACER:
+            return f'    <div style="height: {block.size}pt"></div>'
+        elif kind == BlockKind.DIVIDER:
+            return f'    <div class="divider">{DIVIDER}</div>'
+        elif kind == BlockKind.PAGE_BREAK:
+            return f'    <div class="page-break"></div>\n    <div class="page-number">{block.label}</div>'
+        elif kind == BlockKind.SCHEDULE:
+            text = cls._text_source(block.segments, preformatted=True)
+        elif kind == BlockKind.SIGNATURE:
+            source = lambda nodes: cls._text_source(nodes, preformatted=True)
+            text = '\n'.join(_row_source(row, source).rstrip() for row in block.rows)
+        elif kind in (BlockKind.CLAUSE, BlockKind.SUBCLAUSE):
+            text = f"{block.label} {cls._text_source(block.segments)}"
+        else:
+            text = cls._text_source(block.segments)
+        return f'    <div class="{cls.BLOCK_CLASSES[kind]}">{text}</div>'
 
-                 (2)  Signature:……………………………..
-                      Name: {{witness2_name}}
-                      Address: {{witness2_address}}
-                      CNIC #: {{witness2_cnic}}
-    </div>
-</body>
-</html>"""
-        return jinja2.Template(template).render(**self.form_data, current_date=self.current_date.strftime('%d %B %Y'))
-    
-    def save(self, output_path: str):
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'w') as f:
-            f.write(self.generate())
-
-class PDFGenerator(BaseDocumentGenerator):
-    def __init__(self, form_data: dict):
-        super().__init__(form_data)
-        self.styles = getSampleStyleSheet()
-        self._setup_styles()
-    
-    def _setup_styles(self):
-        """Setup custom styles for the PDF document"""
-        self.styles.add(ParagraphStyle(
-            name='DHATitle',
-            parent=self.styles['Title'],
-            fontSize=14,
-            spaceAfter=6,
-            alignment=TA_CENTER,
-            leading=16
-        ))
-        self.styles.add(ParagraphStyle(
-            name='DHASubTitle',
-            parent=self.styles['Title'],
-            fontSize=12,
-            spaceAfter=4,
-            alignment=TA_CENTER,
-            leading=14
-        ))
-        self.styles.add(ParagraphStyle(
-            name='DHABody',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            leading=13,
-            alignment=TA_JUSTIFY,
-            firstLineIndent=36  # Add indentation for paragraphs
-        ))
-        self.styles.add(ParagraphStyle(
-            name='DHAHeading',
-            parent=self.styles['Heading1'],
-            fontSize=12,
-            spaceAfter=12,
-            alignment=TA_CENTER,
-            leading=14
-        ))
-        self.styles.add(ParagraphStyle(
-            name='DHAPageNumber',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            alignment=TA_LEFT,
-            leading=14,
-            leftIndent=36
-        ))
-        self.styles.add(ParagraphStyle(
-            name='DHAClause',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            leading=13,
-            alignment=TA_JUSTIFY,
-            leftIndent=36,
-            firstLineIndent=-36
-        ))
-
-    def generate(self) -> list:
-        story = []
-        
-        # Title section with exact spacing
-        story.append(Spacer(1, 30))
-        story.append(Paragraph("R e s i d e n t i a l", self.styles['DHATitle']))
-        story.append(Spacer(1, 12))
-        story.append(Paragraph("Pakistan Defence Officers Housing Authority", self.styles['DHATitle']))
-        story.append(Paragraph("K a r a c h i", self.styles['DHATitle']))
-        story.append(Spacer(1, 6))
-        story.append(Paragraph("Licence – 'a'", self.styles['DHATitle']))
-        story.append(Spacer(1, 36))
-        
-        # Add divider lines with exact spacing
-        story.append(Paragraph("-" * 75, self.styles['DHAHeading']))
-        story.append(Spacer(1, 36))
-        story.append(Paragraph("-" * 75, self.styles['DHAHeading']))
-        story.append(Spacer(1, 48))
-        
-        # Repeat header
-        story.append(Paragraph("Pakistan Defence Officers Housing Authority", self.styles['DHATitle']))
-        story.append(Paragraph("K a r a c h i", self.styles['DHATitle']))
-        story.append(Spacer(1, 6))
-        story.append(Paragraph("Licence 'a'", self.styles['DHATitle']))
-        story.append(Spacer(1, 24))
-        
-        # Main content with proper indentation and spacing
-        main_content = f"""THIS INDENTURE made this {self.current_date.strftime('%d')}th day of {self.current_date.strftime('%B')} (in the year two thousand and {self.year_in_words}) BETWEEN the Pakistan Defence Officers Housing Authority established under Article 4 of Pakistan Defence Officers Housing Authority Order, 1980, having its office at Korangi Road, Karachi (hereinafter called the "1st Party") AND {self.form_data['licensee_name']}\n{self.form_data['licensee_address']}\n(hereinafter called the "Licensee-2nd Party". The terms 1st Party and 2nd Party shall include their respective executors, successors-in-interest and assigns)."""
-        
-        story.append(Paragraph(main_content, self.styles['DHABody']))
-        story.append(Spacer(1, 24))
-        
-        # Add KPT details
-        kpt_details = f"""WHEREAS the (KPT) Karachi Port Trust (hereinafter referred to as the lessor) through a deed registered in the office of the Sub-Registrar {self.form_data['sub_registrar']} Town, Karachi, as No {self.form_data['kpt_book_no']} Book-I dated {self.form_data['kpt_book_date'].strftime('%d-%m-%Y')}, M.F. Roll No.{self.form_data['kpt_mf_roll_no']} dated {self.form_data['kpt_mf_roll_date'].strftime('%d-%m-%Y')} admeasuring ­­­­­­­{self.form_data['land_size']} acres, had authorised the Pakistan Defence Officers Housing Authority, Karachi (hereinafter called the Authority) to enter upon the entire area of land shown in the plan attached to the lease including the plot referred to hereinafter for the purpose of developing it and for the construction of building, possession whereof had already been taken over by the Authority subject to, the terms and conditions contained in the Agreement;"""
-        
-        story.append(Paragraph(kpt_details, self.styles['DHABody']))
-        story.append(Spacer(1, 24))
-        
-        # Add possession clause
-        possession_clause = f"""AND WHEREAS the 1st Party now being fully entitled to seize and well possessed of all the piece and parcel of land measuring {self.form_data['land_size']} acres of land in Deh {self.form_data['deh']} bearing survey sheet No. {self.form_data['survey_sheet_number']} and fully described in the Schedule hereunder and fully competent and legally entitled as owners to allot the same."""
-        
-        story.append(Paragraph(possession_clause, self.styles['DHABody']))
-        story.append(Spacer(1, 24))
-        
-        # Add transfer clause
-        transfer_clause = f"""AND WHEREAS the licensee has been allotted / transferred vide allotment / transfer order No {self.form_data['transfer_order_no']} dated {self.form_data['transfer_order_date'].strftime('%d-%m-%Y')} the plot bearing No. {self.form_data['plot_number']} Survey Sheet No.{self.form_data['survey_sheet_number']} in the territorial division of {self.form_data['territorial_division']} Police Station in the layout plan of the entire area measuring {self.form_data['land_size']} acres as shown in the Schedule hereunder."""
-        
-        story.append(Paragraph(transfer_clause, self.styles['DHABody']))
-        
-        # Add page number
-        story.append(PageBreak())
-        story.append(Paragraph("2", self.styles['DHAPageNumber']))
-        story.append(Spacer(1, 12))
-        
-        # Add license clause
-        story.append(Paragraph("AND WHEREAS under the licence the 2nd Party is entitled to enter upon the said plot of land for the purpose of constructing a building thereon.", self.styles['DHABody']))
-        story.append(Spacer(1, 24))
-        
-        # Add witnesseth clause
-        story.append(Paragraph("NOW THIS INDENTURE WITNESSETH as follows :--", self.styles['DHABody']))
-        story.append(Spacer(1, 24))
-        
-        # Add numbered clauses with proper indentation
-        story.append(Paragraph("1.\tThat the 1st Party do hereby authorise and permit the 2nd Party to enter upon the said plot of land for the purpose of constructing a building thereon in accordance with the terms and conditions hereinafter following :--", self.styles['DHAClause']))
-        story.append(Spacer(1, 12))
-        
-        # Add subclauses with proper indentation
-        subclauses = [
-            "(i)\tThe 2nd Party shall at his own cost and within the period of 2 years from the date of execution of this licence erect, complete and finish upon the said plot a residential house in accordance with the plan and design approved by the competent authority (hereinafter called the \"Authority\") subject to the condition that no construction work shall be started by the 2nd Party on his plot unless the preliminary stages of development shall have been completed and permission in writing shall have been obtained from the Authority. In the event of the licensee failing to comply with the conditions hereinafter appearing the 1st Party may at his discretion recover from the 2nd Party as agreed liquidated damages and not by way of penalty a sum equal to half per sent of the estimated cost of work remaining incomplete for every month the work remains incomplete subject to maximum of 5 per cent of the estimated cost of the work remaining un-finished after the due date. Provided that if the licensee fails to complete and finish the building by the date finally fixed by the Authority, the 1st Party may terminate this licence and resume the plot and any structures erected thereon.",
-            "(ii)\tThe construction shall be done in accordance with the building bye-laws and the rules laid down by the Authority (1st Party).",
-            "(iii)\tWith the execution of these presents the rights and liabilities accrued under this instrument shall devolve upon the 2nd Party and he shall be bound by such terms and conditions of the licence as are expressly or by necessary implication or analogy applicable to him.",
-            "(iv)\tThis is a licence with permission to build and occupy. After the completion of the building a proper lease will be given to the Licensee for a period of 99 years by the (1st Party) on such terms and conditions as they deem necessary or may be imposed by the Government or any other Authority.",
-            "(v)\tThe Licensee shall deposit with any scheduled bank duly authorised by the 1st Party or with the 1st Party :",
-            f"(a)\tThe amount at the rate of Rs.{self.form_data['premium_rate']} per square yard to be paid in lump sum before execution of this licence agreement towards the premium of the plot.",
-            f"(b)\tThe ground rent is payable in advance on or before the first day of July every year at the rate of {self.form_data['ground_rent_rate']} paisas per square yard per annum. The first payment shall be made on the first day of July, next following the day when the licensee takes possession of the plot allotted/transferred to him/her,",
-            "(vi)\tThe 2nd Party shall pay all the calls (hereinafter called the \"development charges\") levied by the 1st Party from time to time at their office for an amount equal to the proportion of expenses to be incurred by the (1st Party) on the execution and completion of the development schemes. The decision of the Executive Board of the 1st Party as to the amount so payable shall be final and binding on the licensee."
-        ]
-        
-        for subclause in subclauses:
-            story.append(Paragraph(subclause, self.styles['DHAClause']))
-            story.append(Spacer(1, 6))
-        
-        # Add page 3
-        story.append(PageBreak())
-        story.append(Paragraph("3", self.styles['DHAPageNumber']))
-        story.append(Spacer(1, 12))
-        
-        # Additional clauses
-        story.append(Paragraph("(vii)\tAll arrears of payments due and payable by the Licensee shall be recoverable as arrears of land revenues.", self.styles['DHAClause']))
-        story.append(Spacer(1, 24))
-        
-        story.append(Paragraph("2.\tIt is hereby agreed that on the completion of the building in accordance with the said terms and conditions and on the licensee complying with the said rules he shall be entitled to a lease of the said plot for 99 years in the form prescribed by the Executive Board of the 1st Party and IT IS HEREBY FURTHER AGREED that until such lease has been granted by the (1st Party) the licensee shall not have any right or interest in the said plot except that of a bare licensee and shall not without the previous permission in writing of the (1st Party) transfer his interest in the area allotted to him either in part or whole except for the purpose of raising loans from the House Building Finance Corporation, authorised banks and insurance companies for construction of building thereon.", self.styles['DHAClause']))
-        story.append(Spacer(1, 24))
-        
-        story.append(Paragraph("3.\tShould the licensee commit breach of any of the terms and conditions of these presents or should he neglect to comply with any direction given to him by the 1st Party or in any other respect fail to carry out his obligations under these presents for reasons not beyond his control or fail to pay development charges or other dues, the 1st Party shall have the right to terminate this licence and on such termination the payment made by him to the 1st Party shall be forfeited and he shall have no further claim whatsoever against the 1st Party except at the option of 1st Party he may receive compensation to the extent of the amount of actual expenditure incurred by him on the plot.", self.styles['DHAClause']))
-        story.append(Spacer(1, 24))
-        
-        story.append(Paragraph("Provided that the 1st Party may in his absolute discretion have the building sold out either by public auction or private contract, in which case the licensee shall be entitled to the net sale proceeds of the building or to the amount of actual expenditure incurred by him on having the building constructed whichever is less.", self.styles['DHABody']))
-        story.append(Spacer(1, 36))
-        
-        # Add schedule
-        story.append(Paragraph("THE SCHEDULE ABOVE REFERRED TO", self.styles['DHAHeading']))
-        story.append(Spacer(1, 24))
-        
-        schedule = f"""ALL that piece and parcel of land measuring {self.form_data['plot_area']} square yards bearing Plot No {self.form_data['plot_number']} and bounded
-North................... {self.form_data['north_boundary']}
-South ................{self.form_data['south_boundary']}
-East................... {self.form_data['east_boundary']}
-West................... {self.form_data['west_boundary']}
-Situated in Police Station {self.form_data['police_station']}"""
-        
-        story.append(Paragraph(schedule, self.styles['DHABody']))
-        
-        # Add page 4
-        story.append(PageBreak())
-        story.append(Paragraph("4", self.styles['DHAPageNumber']))
-        story.append(Spacer(1, 48))
-        
-        # Add signature section with proper spacing
-        signature_section = """SIGNED by the Secretary, Pakistan\t\t\t\t    …………………………………………...
-Defence Officers Housing Authority Karachi.\t\t\t               Signature of the Secretary
-In the presence of :\t\t\t\t\t\t                 1st Party"""
-        
-        story.append(Paragraph(signature_section, self.styles['DHABody']))
-        story.append(Spacer(1, 72))
-        
-        # Add witness section
-        witness_section = f"""SIGNED by the above named\t\t\t\t    …………………………………………...
-Licensee – 2nd Party in the\t\t\t\t\t        Licensee / 2nd Party
-Presence of :
+    @classmethod
+    def template_source(cls, model: tuple) -> str:
+        """Build the Jinja2 template for a document model"""
+        body = '\n'.join(cls._block_source(block) for block in model)
+        return f"{HTML_HEAD}{body}\n</body>\n</html>"
 
-Witness: (1)  Signature:……………………………..
-\tName: {self.form_data['witness1_name']}
-\tAddress: {self.form_data['witness1_address']}
-\tCNIC #: {self.form_data['witness1_cnic']}
+    def generate(self) -> str:
+        template = template_registry.get(self.form_type, OutputFormat.HTML)
+        return template.render(**self.context)
 
+    def iter_chunks(self):
+        stream = template_registry.get(self.form_type, OutputFormat.HTML).stream(**self.context)
+        stream.enable_buffering(TEMPLATE_STREAM_BUFFER)
+        for chunk in stream:
+            yield chunk.encode('utf-8')
 
-  (2)  Signature:……………………………..
-\tName: {self.form_data['witness2_name']}
-\tAddress: {self.form_data['witness2_address']}
-\tCNIC #: {self.form_data['witness2_cnic']}"""
-        
-        story.append(Paragraph(witness_section, self.styles['DHABody']))
-        
-        return story
-    
-    def save(self, output_path: str):
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        doc = SimpleDocTemplate(
-            output_path,
-            pagesize=A4,
-            rightMargin=inch,
-            leftMargin=inch,
-            topMargin=inch,
-            bottomMargin=inch
-        )
-        doc.build(self.generate())
+    def write(self, stream):
+        with self._timer('generate'):
+            stream.writelines(self.iter_chunks())
 
 class DHALicenseGenerator:
-    def __init__(self, form_data: dict, output_format: OutputFormat = OutputFormat.DOCX):
+    form_type = FormType.DHA_LICENSE_A
+
+    def __init__(self, form_data: dict, output_format: OutputFormat = OutputFormat.DOCX, context: dict = None):
         self.form_data = form_data
         self.output_format = output_format
+        self._context = context
         self._generator = self._create_generator()
     
     def _create_generator(self) -> BaseDocumentGenerator:
+        # DOCX and PDF backends are imported on first use, see BACKEND_MODULES
         if self.output_format == OutputFormat.DOCX:
-            return DocxGenerator(self.form_data)
+            from docx_generator import DocxGenerator, DocxStreamGenerator
+            if Config.DOCX_BACKEND == 'stream':
+                return DocxStreamGenerator(self.form_data, self.form_type, self._context)
+            return DocxGenerator(self.form_data, self.form_type, self._context)
         elif self.output_format == OutputFormat.PDF:
-            return PDFGenerator(self.form_data)
+            from pdf_generator import PDFGenerator
+            return PDFGenerator(self.form_data, self.form_type, self._context)
         elif self.output_format == OutputFormat.MARKDOWN:
-            return MarkdownGenerator(self.form_data)
+            return MarkdownGenerator(self.form_data, self.form_type, self._context)
         elif self.output_format == OutputFormat.HTML:
-            return HtmlGenerator(self.form_data)
+            return HtmlGenerator(self.form_data, self.form_type, self._context)
         else:
             raise ValueError(f"Unsupported output format: {self.output_format}")
     
+    @property
+    def context(self) -> dict:
+        return self._generator.context
+
+    @property
+    def mimetype(self) -> str:
+        return self._generator.mimetype
+
+    @property
+    def extension(self) -> str:
+        return self._generator.extension
+
     def generate(self):
         return self._generator.generate()
+
+    def write(self, stream):
+        self._generator.write(stream)
+
+    def to_bytes(self) -> bytes:
+        return self._generator.to_bytes()
+
+    def iter_chunks(self):
+        return self._generator.iter_chunks()
     
     def save(self, output_path: str):
         self._generator.save(output_path)
@@ -839,7 +378,7 @@ class DocumentGeneratorFactory:
     }
     
     @staticmethod
-    def create_generator(form_type: FormType, form_data: dict, output_format: str = "docx") -> BaseDocumentGenerator:
+    def create_generator(form_type: FormType, form_data: dict, output_format: str = "docx", context: dict = None) -> BaseDocumentGenerator:
         # Validate output format
         try:
             output_format = OutputFormat(output_format.lower())
@@ -851,8 +390,56 @@ class DocumentGeneratorFactory:
             raise ValueError(f"No document generator registered for form type: {form_type}")
         
         # Create generator for the specific format
-        return generator_class(form_data, output_format)
+        with metrics.timer('construct', form_type, output_format):
+            return generator_class(form_data, output_format, context)
     
     @staticmethod
     def register_generator(form_type: FormType, generator_class: type):
-        DocumentGeneratorFactory._generators[form_type] = generator_class 
\ No newline at end of file
+        DocumentGeneratorFactory._generators[form_type] = generator_class
+
+def render_formats(form_type: FormType, form_data: dict, output_formats) -> dict:
+    """Render one form into several formats at once.
+
+    The fields are formatted once and the context is shared by every
+    generator; the formats are then rendered concurrently. Returns
+    ``{output_format: (extension, content)}`` in the order requested.
+    """
+    generators = {}
+    context = None
+    for output_format in output_formats:
+        value = output_format.value if isinstance(output_format, OutputFormat) else output_format
+        generator = DocumentGeneratorFactory.create_generator(form_type, form_data, value, context)
+        context = generator.context
+        generators[generator.output_format] = generator
+    with ThreadPoolExecutor(max_workers=len(generators) or 1) as executor:
+        contents = dict(zip(generators, executor.map(lambda generator: generator.to_bytes(), generators.values())))
+    return {output_format: (generators[output_format].extension, contents[output_format]) for output_format in generators}
+
+def write_bundle(stream, basename: str, documents: dict):
+    """Write the output of ``render_formats`` to ``stream`` as a ZIP with one file per format"""
+    with ZipStreamWriter(stream) as archive:
+        for extension, content in documents.values():
+            archive.writestr(f"{basename}.{extension}", content)
+
+for form_type, model in DOCUMENT_MODELS.items():
+    template_registry.register(form_type, OutputFormat.MARKDOWN, MarkdownGenerator.template_source(model))
+    template_registry.register(form_type, OutputFormat.HTML, HtmlGenerator.template_source(model))
+
+def preload_backends(output_formats):
+    """Import the rendering backends for the given formats now rather than on first use"""
+    for output_format in output_formats:
+        module = BACKEND_MODULES.get(OutputFormat(output_format))
+        if module:
+            importlib.import_module(module)
+
+def warm_up_generators(output_formats=None):
+    """Fill every per-process cache by rendering a blank document of each type and format, e.g. at worker start"""
+    output_formats = [OutputFormat(f) for f in output_formats] if output_formats else list(OutputFormat)
+    template_registry.compile_all()
+    if OutputFormat.PDF in output_formats:
+        from pdf_generator import warm_up_pdf
+        warm_up_pdf()
+    for form_type, model in DOCUMENT_MODELS.items():
+        blank = {name: '' for block in model for name in block.fields}
+        for output_format in output_formats:
+            DocumentGeneratorFactory.create_generator(form_type, blank, output_format.value).to_bytes()
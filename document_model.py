@@ -0,0 +1,198 @@
+from enum import Enum
+from string import Formatter
+from config import FormType
+
+class BlockKind(Enum):
+    TITLE = "title"
+    HEADING = "heading"
+    DIVIDER = "divider"
+    SPACER = "spacer"
+    PAGE_BREAK = "page_break"
+    BODY = "body"
+    CLAUSE = "clause"
+    SUBCLAUSE = "subclause"
+    SCHEDULE = "schedule"
+    SIGNATURE = "signature"
+
+class _Node:
+    """Base for the immutable document model nodes."""
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} nodes are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} nodes are immutable")
+
+    def _key(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash((type(self), self._key()))
+
+    def __repr__(self):
+        args = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({args})"
+
+class Text(_Node):
+    """Literal legal text."""
+    __slots__ = ('value',)
+
+    def __init__(self, value: str):
+        object.__setattr__(self, 'value', value)
+
+class Field(_Node):
+    """Placeholder filled from the generator context at render time."""
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        object.__setattr__(self, 'name', name)
+
+class Row(_Node):
+    """One line of a signature block, with optional right-hand text."""
+    __slots__ = ('left', 'right', 'indent')
+
+    def __init__(self, left: str = "", right: str = "", indent: int = 0):
+        object.__setattr__(self, 'left', segments(left))
+        object.__setattr__(self, 'right', right)
+        object.__setattr__(self, 'indent', indent)
+
+class Block(_Node):
+    """A paragraph-level element of a document.
+
+    ``segments`` holds the paragraph text, ``label`` the clause number (or
+    the page number for page breaks), ``rows`` the lines of a signature
+    block and ``size`` the height of a spacer in points.
+    """
+    __slots__ = ('kind', 'segments', 'label', 'rows', 'size')
+
+    def __init__(self, kind: BlockKind, text: str = "", label: str = "", rows: tuple = (), size: int = 0):
+        object.__setattr__(self, 'kind', kind)
+        object.__setattr__(self, 'segments', segments(text))
+        object.__setattr__(self, 'label', label)
+        object.__setattr__(self, 'rows', tuple(rows))
+        object.__setattr__(self, 'size', size)
+
+    @property
+    def fields(self) -> tuple:
+        all_segments = self.segments + tuple(s for row in self.rows for s in row.left)
+        return tuple(s.name for s in all_segments if isinstance(s, Field))
+
+    @property
+    def is_static(self) -> bool:
+        return not self.fields
+
+def segments(text: str) -> tuple:
+    """Split ``text`` on ``{field}`` placeholders into Text and Field nodes."""
+    result = []
+    for literal, field_name, _, _ in Formatter().parse(text):
+        if literal:
+            result.append(Text(literal))
+        if field_name is not None:
+            result.append(Field(field_name))
+    return tuple(result)
+
+def resolve(nodes: tuple, context: dict) -> str:
+    """Join segments into plain text, substituting fields from ``context``."""
+    return ''.join(node.value if type(node) is Text else context[node.name] for node in nodes)
+
+DOTS = "…………………………………………..."
+SIGNATURE_DOTS = "…………………………….."
+
+DHA_LICENSE_A = (
+    Block(BlockKind.SPACER, size=30),
+    Block(BlockKind.TITLE, "R e s i d e n t i a l"),
+    Block(BlockKind.SPACER, size=12),
+    Block(BlockKind.TITLE, "Pakistan Defence Officers Housing Authority"),
+    Block(BlockKind.TITLE, "K a r a c h i"),
+    Block(BlockKind.SPACER, size=6),
+    Block(BlockKind.TITLE, "Licence – 'a'"),
+    Block(BlockKind.SPACER, size=36),
+    Block(BlockKind.DIVIDER),
+    Block(BlockKind.SPACER, size=36),
+    Block(BlockKind.DIVIDER),
+    Block(BlockKind.SPACER, size=48),
+    Block(BlockKind.TITLE, "Pakistan Defence Officers Housing Authority"),
+    Block(BlockKind.TITLE, "K a r a c h i"),
+    Block(BlockKind.SPACER, size=6),
+    Block(BlockKind.TITLE, "Licence 'a'"),
+    Block(BlockKind.SPACER, size=24),
+
+    # Preamble and recitals
+    Block(BlockKind.BODY, 'THIS INDENTURE made this {execution_day} day of {execution_month} (in the year {execution_year_words}) BETWEEN the Pakistan Defence Officers Housing Authority established under Article 4 of Pakistan Defence Officers Housing Authority Order, 1980, having its office at Korangi Road, Karachi (hereinafter called the "1st Party") AND {licensee_name}\n{licensee_address}\n(hereinafter called the "Licensee-2nd Party". The terms 1st Party and 2nd Party shall include their respective executors, successors-in-interest and assigns).'),
+    Block(BlockKind.BODY, "WHEREAS the (KPT) Karachi Port Trust (hereinafter referred to as the lessor) through a deed registered in the office of the Sub-Registrar {sub_registrar} Town, Karachi, as No {kpt_book_no} Book-I dated {kpt_book_date}, M.F. Roll No.{kpt_mf_roll_no} dated {kpt_mf_roll_date} admeasuring {land_size} acres, had authorised the Pakistan Defence Officers Housing Authority, Karachi (hereinafter called the Authority) to enter upon the entire area of land shown in the plan attached to the lease including the plot referred to hereinafter for the purpose of developing it and for the construction of building, possession whereof had already been taken over by the Authority subject to, the terms and conditions contained in the Agreement;"),
+    Block(BlockKind.BODY, "AND WHEREAS the 1st Party now being fully entitled to seize and well possessed of all the piece and parcel of land measuring {land_size} acres of land in Deh {deh} bearing survey sheet No. {survey_sheet_number} and fully described in the Schedule hereunder and fully competent and legally entitled as owners to allot the same."),
+    Block(BlockKind.BODY, "AND WHEREAS the licensee has been allotted / transferred vide allotment / transfer order No {transfer_order_no} dated {transfer_order_date} the plot bearing No. {plot_number} Survey Sheet No.{survey_sheet_number} in the territorial division of {territorial_division} Police Station in the layout plan of the entire area measuring {land_size} acres as shown in the Schedule hereunder."),
+
+    Block(BlockKind.PAGE_BREAK, label="2"),
+    Block(BlockKind.BODY, "AND WHEREAS under the licence the 2nd Party is entitled to enter upon the said plot of land for the purpose of constructing a building thereon."),
+    Block(BlockKind.BODY, "NOW THIS INDENTURE WITNESSETH as follows :--"),
+
+    # Clause 1 and its subclauses
+    Block(BlockKind.CLAUSE, "That the 1st Party do hereby authorise and permit the 2nd Party to enter upon the said plot of land for the purpose of constructing a building thereon in accordance with the terms and conditions hereinafter following :--", label="1."),
+    Block(BlockKind.SUBCLAUSE, 'The 2nd Party shall at his own cost and within the period of 2 years from the date of execution of this licence erect, complete and finish upon the said plot a residential house in accordance with the plan and design approved by the competent authority (hereinafter called the "Authority") subject to the condition that no construction work shall be started by the 2nd Party on his plot unless the preliminary stages of development shall have been completed and permission in writing shall have been obtained from the Authority. In the event of the licensee failing to comply with the conditions hereinafter appearing the 1st Party may at his discretion recover from the 2nd Party as agreed liquidated damages and not by way of penalty a sum equal to half per sent of the estimated cost of work remaining incomplete for every month the work remains incomplete subject to maximum of 5 per cent of the estimated cost of the work remaining un-finished after the due date. Provided that if the licensee fails to complete and finish the building by the date finally fixed by the Authority, the 1st Party may terminate this licence and resume the plot and any structures erected thereon.', label="(i)"),
+    Block(BlockKind.SUBCLAUSE, "The construction shall be done in accordance with the building bye-laws and the rules laid down by the Authority (1st Party).", label="(ii)"),
+    Block(BlockKind.SUBCLAUSE, "With the execution of these presents the rights and liabilities accrued under this instrument shall devolve upon the 2nd Party and he shall be bound by such terms and conditions of the licence as are expressly or by necessary implication or analogy applicable to him.", label="(iii)"),
+    Block(BlockKind.SUBCLAUSE, "This is a licence with permission to build and occupy. After the completion of the building a proper lease will be given to the Licensee for a period of 99 years by the (1st Party) on such terms and conditions as they deem necessary or may be imposed by the Government or any other Authority.", label="(iv)"),
+    Block(BlockKind.SUBCLAUSE, "The Licensee shall deposit with any scheduled bank duly authorised by the 1st Party or with the 1st Party :", label="(v)"),
+    Block(BlockKind.SUBCLAUSE, "The amount at the rate of Rs.{premium_rate} per square yard, that is Rs.{total_premium} ({total_premium_words}) for {plot_area} square yards, to be paid {premium_terms} towards the premium of the plot.", label="(a)"),
+    Block(BlockKind.SUBCLAUSE, "The ground rent is payable in advance on or before the first day of July every year at the rate of {ground_rent_rate} paisas per square yard per annum, that is Rs.{annual_ground_rent} ({annual_ground_rent_words}) per annum. The first payment shall be made on the first day of July, next following the day when the licensee takes possession of the plot allotted/transferred to him/her,", label="(b)"),
+    Block(BlockKind.SUBCLAUSE, 'The 2nd Party shall pay all the calls (hereinafter called the "development charges") levied by the 1st Party from time to time at their office for an amount equal to the proportion of expenses to be incurred by the (1st Party) on the execution and completion of the development schemes. The decision of the Executive Board of the 1st Party as to the amount so payable shall be final and binding on the licensee.', label="(vi)"),
+
+    Block(BlockKind.PAGE_BREAK, label="3"),
+    Block(BlockKind.SUBCLAUSE, "All arrears of payments due and payable by the Licensee shall be recoverable as arrears of land revenues.", label="(vii)"),
+
+    # Clauses 2 and 3
+    Block(BlockKind.CLAUSE, "It is hereby agreed that on the completion of the building in accordance with the said terms and conditions and on the licensee complying with the said rules he shall be entitled to a lease of the said plot for 99 years in the form prescribed by the Executive Board of the 1st Party and IT IS HEREBY FURTHER AGREED that until such lease has been granted by the (1st Party) the licensee shall not have any right or interest in the said plot except that of a bare licensee and shall not without the previous permission in writing of the (1st Party) transfer his interest in the area allotted to him either in part or whole except for the purpose of raising loans from the House Building Finance Corporation, authorised banks and insurance companies for construction of building thereon.", label="2."),
+    Block(BlockKind.CLAUSE, "Should the licensee commit breach of any of the terms and conditions of these presents or should he neglect to comply with any direction given to him by the 1st Party or in any other respect fail to carry out his obligations under these presents for reasons not beyond his control or fail to pay development charges or other dues, the 1st Party shall have the right to terminate this licence and on such termination the payment made by him to the 1st Party shall be forfeited and he shall have no further claim whatsoever against the 1st Party except at the option of 1st Party he may receive compensation to the extent of the amount of actual expenditure incurred by him on the plot.", label="3."),
+    Block(BlockKind.BODY, "Provided that the 1st Party may in his absolute discretion have the building sold out either by public auction or private contract, in which case the licensee shall be entitled to the net sale proceeds of the building or to the amount of actual expenditure incurred by him on having the building constructed whichever is less."),
+
+    # Schedule
+    Block(BlockKind.HEADING, "THE SCHEDULE ABOVE REFERRED TO"),
+    Block(BlockKind.SCHEDULE, "ALL that piece and parcel of land measuring {plot_area} square yards bearing Plot No {plot_number} and bounded\n"
+                              "North................... {north_boundary}\n"
+                              "South ................{south_boundary}\n"
+                              "East................... {east_boundary}\n"
+                              "West................... {west_boundary}\n"
+                              "Situated in Police Station {police_station}"),
+
+    # Execution
+    Block(BlockKind.PAGE_BREAK, label="4"),
+    Block(BlockKind.SPACER, size=48),
+    Block(BlockKind.SIGNATURE, rows=(
+        Row("SIGNED by the Secretary, Pakistan", DOTS),
+        Row("Defence Officers Housing Authority Karachi.", "Signature of the Secretary"),
+        Row("In the presence of :", "1st Party"),
+        Row(),
+        Row("1."),
+        Row(),
+        Row(),
+        Row("2."),
+        Row(),
+        Row(),
+        Row("", DOTS),
+        Row("", "Member Executive Board"),
+    )),
+    Block(BlockKind.SPACER, size=72),
+    Block(BlockKind.SIGNATURE, rows=(
+        Row("SIGNED by the above named", DOTS),
+        Row("Licensee – 2nd Party in the", "Licensee / 2nd Party"),
+        Row("Presence of :"),
+        Row(f"Witness: (1)  Signature:{SIGNATURE_DOTS}"),
+        Row("Name: {witness1_name}", indent=2),
+        Row("Address: {witness1_address}", indent=2),
+        Row("CNIC #: {witness1_cnic}", indent=2),
+        Row(),
+        Row(f"(2)  Signature:{SIGNATURE_DOTS}", indent=1),
+        Row("Name: {witness2_name}", indent=2),
+        Row("Address: {witness2_address}", indent=2),
+        Row("CNIC #: {witness2_cnic}", indent=2),
+    )),
+)
+
+DOCUMENT_MODELS = {
+    FormType.DHA_LICENSE_A: DHA_LICENSE_A
+}
@@ -0,0 +1,391 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from config import Config, FormType
+from document_generator import DocumentGeneratorFactory, OutputFormat
+from document_cache import document_cache
+
+try:
+    import zstandard
+except ImportError:  # Archives fall back to zlib with the same dictionary
+    zstandard = None
+
+RETENTION_INTERVAL = 15 * 60  # Seconds between retention passes in each process
+
+# How a document is kept
+FILE = 'file'
+ARCHIVE = 'archive'
+
+# Formats whose rendered bytes are worth keeping compressed; DOCX and PDF are compressed already
+TEXT_FORMATS = (OutputFormat.HTML, OutputFormat.MARKDOWN)
+ZLIB_DICTIONARY_SIZE = 32 * 1024  # zlib only uses the last 32KB of a preset dictionary
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    license_id TEXT,
+    form_type TEXT NOT NULL,
+    plot_number TEXT,
+    format TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    storage TEXT NOT NULL DEFAULT 'file',
+    template_version TEXT,
+    codec TEXT,
+    dictionary_id INTEGER,
+    payload BLOB,
+    content BLOB
+);
+CREATE TABLE IF NOT EXISTS dictionaries (
+    id INTEGER PRIMARY KEY,
+    form_type TEXT NOT NULL,
+    template_version TEXT NOT NULL,
+    data BLOB NOT NULL,
+    UNIQUE (form_type, template_version)
+);
+CREATE INDEX IF NOT EXISTS documents_license ON documents (license_id);
+CREATE INDEX IF NOT EXISTS documents_plot ON documents (plot_number);
+CREATE INDEX IF NOT EXISTS documents_created ON documents (created_at);
+"""
+
+RECORD_COLUMNS = ('id, license_id, form_type, plot_number, format, size, created_at, '
+                  'storage, template_version, codec, dictionary_id')
+
+# Columns added to the documents table for archive mode, added to indexes created before it
+ARCHIVE_COLUMNS = {
+    'storage': "TEXT NOT NULL DEFAULT 'file'",
+    'template_version': 'TEXT',
+    'codec': 'TEXT',
+    'dictionary_id': 'INTEGER',
+    'payload': 'BLOB',
+    'content': 'BLOB'
+}
+
+
+class TemplateChangedError(RuntimeError):
+    """An archived document would render differently: its templates have changed since it was issued"""
+
+
+def _compress(codec: str, dictionary: bytes, data: bytes) -> bytes:
+    if codec == 'zstd':
+        compression_dict = zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        return zstandard.ZstdCompressor(level=19, dict_data=compression_dict).compress(data)
+    compressor = zlib.compressobj(9, zdict=dictionary[-ZLIB_DICTIONARY_SIZE:])
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(codec: str, dictionary: bytes, data: bytes) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("This document was archived with zstd; install the 'zstandard' package to read it")
+        compression_dict = zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        return zstandard.ZstdDecompressor(dict_data=compression_dict).decompress(data)
+    decompressor = zlib.decompressobj(zdict=dictionary[-ZLIB_DICTIONARY_SIZE:])
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+class DocumentStore:
+    """Generated documents on disk, indexed in SQLite.
+
+    Each document gets a random hex id and is stored at
+    ``<root>/<id[:2]>/<id[2:4]>/<id>.<format>``, so its path follows from
+    the id alone and no directory grows past a few entries however many
+    documents are kept. Files are written to a temporary name and renamed
+    into place, and are only indexed once complete. Documents older than
+    ``max_age_days`` or beyond ``max_bytes`` in total (oldest first) are
+    removed by a periodic retention pass; 0 disables either limit.
+
+    In ``archive`` mode, issued documents are not written out. The store
+    keeps the context they were rendered from (the formatted form data and
+    execution date) with the template version, and renders them again when
+    they are read, byte for byte as issued while the templates are unchanged.
+    With ``compress``, HTML and Markdown renders are kept as well, compressed
+    against a dictionary of the form type's static license text, so they
+    come back byte for byte without rendering, whatever the templates.
+    Contexts are compressed against the same dictionary. zstd is used when
+    the ``zstandard`` package is installed, and zlib otherwise.
+    """
+
+    def __init__(self, root: str, database: str, max_bytes: int = 0, max_age_days: float = 0,
+                 archive: bool = False, compress: bool = True):
+        self.root = root
+        self.database = database
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.archive = archive
+        self.compress = compress
+        self.codec = 'zstd' if zstandard is not None else 'zlib'
+        self._dictionaries = {}
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(self.root, exist_ok=True)
+            os.makedirs(os.path.dirname(self.database) or '.', exist_ok=True)
+        connection = sqlite3.connect(self.database, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        if not self._initialized:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            if self._missing_columns(connection):
+                self._upgrade(connection)
+            self._initialized = True
+        return connection
+
+    @staticmethod
+    def _missing_columns(connection: sqlite3.Connection) -> list:
+        columns = {row['name'] for row in connection.execute('PRAGMA table_info(documents)')}
+        return [name for name in ARCHIVE_COLUMNS if name not in columns]
+
+    def _upgrade(self, connection: sqlite3.Connection):
+        """Add the archive columns to an index created before them.
+
+        Threads and worker processes may start at once, so the columns are
+        checked again under the write lock and added by one of them only.
+        """
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for name in self._missing_columns(connection):
+                connection.execute(f'ALTER TABLE documents ADD COLUMN {name} {ARCHIVE_COLUMNS[name]}')
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def path(self, document_id: str, extension: str) -> str:
+        return os.path.join(self.root, document_id[:2], document_id[2:4], f"{document_id}.{extension}")
+
+    def _record(self, row) -> dict:
+        document = dict(row)
+        document['path'] = self.path(document['id'], document['format']) if document['storage'] == FILE else None
+        return document
+
+    @contextmanager
+    def create(self, form_type, extension: str, license_id: str = None, plot_number: str = None):
+        """Open a new document for writing; yields ``(document_id, stream)``.
+
+        The document is renamed into place and indexed when the block exits
+        without an error, and discarded otherwise.
+        """
+        document_id = self.new_id()
+        path = self.path(document_id, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as stream:
+                yield document_id, stream
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        connection = self._connect()
+        try:
+            connection.execute(
+                'INSERT INTO documents (id, license_id, form_type, plot_number, format, size, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (document_id, license_id, form_type.name, plot_number, extension, size, time.time())
+            )
+        finally:
+            connection.close()
+
+    def put(self, form_type, extension: str, content: bytes, license_id: str = None, plot_number: str = None) -> str:
+        with self.create(form_type, extension, license_id, plot_number) as (document_id, stream):
+            stream.write(content)
+        return document_id
+
+    def _dictionary(self, connection: sqlite3.Connection, dictionary_id: int) -> bytes:
+        dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            dictionary = connection.execute('SELECT data FROM dictionaries WHERE id = ?', (dictionary_id,)).fetchone()[0]
+            self._dictionaries[dictionary_id] = dictionary
+        return dictionary
+
+    def _current_dictionary(self, connection: sqlite3.Connection, form_type: FormType, version: str) -> int:
+        """Id of the dictionary for a form type's current templates, built from its sample documents if needed.
+
+        Dictionaries are kept with the archive, so documents compressed
+        against an older template version can still be read.
+        """
+        row = connection.execute('SELECT id FROM dictionaries WHERE form_type = ? AND template_version = ?',
+                                 (form_type.name, version)).fetchone()
+        if row is None:
+            sample = Config.DEFAULT_VALUES.get(form_type, {})
+            data = b''.join(DocumentGeneratorFactory.create_generator(form_type, sample, output_format.value).to_bytes()
+                            for output_format in TEXT_FORMATS)
+            connection.execute('INSERT OR IGNORE INTO dictionaries (form_type, template_version, data) VALUES (?, ?, ?)',
+                               (form_type.name, version, data))
+            row = connection.execute('SELECT id FROM dictionaries WHERE form_type = ? AND template_version = ?',
+                                     (form_type.name, version)).fetchone()
+        return row['id']
+
+    def put_archived(self, form_type: FormType, form_data: dict, output_format: OutputFormat, extension: str,
+                     content: bytes = None, license_id: str = None) -> str:
+        """Archive a document as the context it was rendered from, plus its compressed bytes for text formats"""
+        document_id = self.new_id()
+        generator = DocumentGeneratorFactory.create_generator(form_type, form_data, output_format.value)
+        payload = json.dumps({'output_format': output_format.value, 'context': generator.context},
+                             separators=(',', ':')).encode('utf-8')
+        version = document_cache.template_version(form_type)
+        connection = self._connect()
+        try:
+            dictionary_id = self._current_dictionary(connection, form_type, version)
+            dictionary = self._dictionary(connection, dictionary_id)
+            payload = _compress(self.codec, dictionary, payload)
+            if content is not None and self.compress and output_format in TEXT_FORMATS:
+                content = _compress(self.codec, dictionary, content)
+            else:
+                content = None
+            connection.execute(
+                'INSERT INTO documents (id, license_id, form_type, plot_number, format, size, created_at, '
+                'storage, template_version, codec, dictionary_id, payload, content) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (document_id, license_id, form_type.name, form_data.get('plot_number'), extension,
+                 len(payload) + len(content or b''), time.time(),
+                 ARCHIVE, version, self.codec, dictionary_id, payload, content)
+            )
+        finally:
+            connection.close()
+        return document_id
+
+    def keep(self, form_type: FormType, form_data: dict, output_format: OutputFormat, extension: str,
+             content: bytes, license_id: str = None) -> str:
+        """Store an issued document as a file, or archived when the store is in archive mode"""
+        if self.archive:
+            return self.put_archived(form_type, form_data, output_format, extension, content, license_id)
+        return self.put(form_type, extension, content, license_id, form_data.get('plot_number'))
+
+    def load(self, document: dict) -> bytes:
+        """The bytes of a stored document, rendering it again if it was archived without them.
+
+        Renders are byte for byte the same as long as the templates are, so
+        a document whose template version has changed since it was archived
+        raises TemplateChangedError instead of coming back with other text.
+        """
+        if document['storage'] == FILE:
+            with open(document['path'], 'rb') as f:
+                return f.read()
+        connection = self._connect()
+        try:
+            payload, content = connection.execute('SELECT payload, content FROM documents WHERE id = ?',
+                                                  (document['id'],)).fetchone()
+            dictionary = self._dictionary(connection, document['dictionary_id'])
+        finally:
+            connection.close()
+        if content is not None:
+            return _decompress(document['codec'], dictionary, content)
+        form_type = FormType[document['form_type']]
+        if document['template_version'] != document_cache.template_version(form_type):
+            raise TemplateChangedError(f"Document {document['id']} was issued with templates that have since "
+                                       "changed, so it cannot be rendered again as issued")
+        payload = json.loads(_decompress(document['codec'], dictionary, payload))
+        generator = DocumentGeneratorFactory.create_generator(form_type, {}, payload['output_format'], payload['context'])
+        return generator.to_bytes()
+
+    def get(self, document_id: str):
+        connection = self._connect()
+        try:
+            row = connection.execute(f'SELECT {RECORD_COLUMNS} FROM documents WHERE id = ?', (document_id,)).fetchone()
+        finally:
+            connection.close()
+        return self._record(row) if row else None
+
+    def find(self, license_id: str = None, plot_number: str = None, limit: int = 100) -> list:
+        """Documents of a license or plot, newest first"""
+        conditions, values = [], []
+        if license_id is not None:
+            conditions.append('license_id = ?')
+            values.append(license_id)
+        if plot_number is not None:
+            conditions.append('plot_number = ?')
+            values.append(plot_number)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+        connection = self._connect()
+        try:
+            rows = connection.execute(f'SELECT {RECORD_COLUMNS} FROM documents {where}ORDER BY created_at DESC LIMIT ?',
+                                      (*values, limit)).fetchall()
+        finally:
+            connection.close()
+        return [self._record(row) for row in rows]
+
+    def _remove(self, connection: sqlite3.Connection, rows) -> int:
+        for row in rows:
+            try:
+                if row['storage'] == FILE:
+                    os.remove(self.path(row['id'], row['format']))
+            except FileNotFoundError:
+                pass
+            connection.execute('DELETE FROM documents WHERE id = ?', (row['id'],))
+        return len(rows)
+
+    def enforce_retention(self) -> int:
+        """Remove documents past the age limit, then the oldest until under the size limit"""
+        removed = 0
+        connection = self._connect()
+        try:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                rows = connection.execute('SELECT id, format, storage FROM documents WHERE created_at < ?', (cutoff,)).fetchall()
+                removed += self._remove(connection, rows)
+            if self.max_bytes:
+                excess = connection.execute('SELECT COALESCE(SUM(size), 0) FROM documents').fetchone()[0] - self.max_bytes
+                cursor = connection.execute('SELECT id, format, storage, size FROM documents ORDER BY created_at')
+                evicted = []
+                for row in cursor:
+                    if excess <= 0:
+                        break
+                    evicted.append(row)
+                    excess -= row['size']
+                cursor.close()
+                removed += self._remove(connection, evicted)
+        finally:
+            connection.close()
+        return removed
+
+    def stats(self) -> dict:
+        connection = self._connect()
+        try:
+            count, size = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents').fetchone()
+        finally:
+            connection.close()
+        return {'documents': count, 'bytes': size, 'max_bytes': self.max_bytes, 'max_age_days': self.max_age_days}
+
+    def _retain(self):
+        while True:
+            try:
+                self.enforce_retention()
+            except sqlite3.Error:
+                pass
+            time.sleep(RETENTION_INTERVAL)
+
+    def ensure_started(self):
+        """Start the retention thread if a size or age limit is set, so each web worker prunes the store on its own"""
+        if not (self.max_bytes or self.max_age_days) or self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            threading.Thread(target=self._retain, name='document-retention', daemon=True).start()
+            self._started_pid = os.getpid()
+
+
+document_store = DocumentStore(
+    Config.DOCUMENT_STORE_FOLDER,
+    Config.DOCUMENT_STORE_DATABASE,
+    Config.DOCUMENT_STORE_MAX_BYTES,
+    Config.DOCUMENT_STORE_MAX_AGE_DAYS,
+    Config.DOCUMENT_STORE_ARCHIVE,
+    Config.DOCUMENT_STORE_COMPRESS
+)
@@ -0,0 +1,319 @@
+from docx import Document
+from docx.shared import Pt, Inches
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_TAB_ALIGNMENT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.opc.pkgwriter import PackageWriter
+from config import FormType, Config
+import os
+import io
+import copy
+import re
+import threading
+import zipfile
+from xml.sax.saxutils import escape as xml_escape
+from zip_stream import ZipStreamWriter, deflate
+from document_model import BlockKind, resolve
+from document_generator import BaseDocumentGenerator, OutputFormat, DIVIDER
+
+# Characters XML 1.0 does not allow; lxml refuses them, so both DOCX backends drop them from the text
+XML_ILLEGAL_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+CARRIAGE_RETURN = {'\r': '&#13;'}
+
+def _append_run_text(run, text: str):
+    """Fill a ``w:r`` element with text, line breaks and tabs.
+
+    Produces the same content as python-docx's ``Run.text`` setter, a whole
+    line segment at a time instead of one character at a time.
+    """
+    text = XML_ILLEGAL_CHARACTERS.sub('', text)
+    for line_number, line in enumerate(text.split('\n')):
+        if line_number:
+            run.append(OxmlElement('w:br'))
+        for chunk_number, chunk in enumerate(line.split('\t')):
+            if chunk_number:
+                run.append(OxmlElement('w:tab'))
+            if chunk:
+                text_element = OxmlElement('w:t')
+                text_element.text = chunk
+                if chunk[0] == ' ' or chunk[-1] == ' ':
+                    text_element.set(qn('xml:space'), 'preserve')
+                run.append(text_element)
+
+class _ZipStreamPackageWriter:
+    """python-docx's physical package writer interface over ZipStreamWriter"""
+
+    def __init__(self, stream):
+        self.archive = ZipStreamWriter(stream)
+
+    def write(self, pack_uri, blob: bytes):
+        self.archive.writestr(pack_uri.membername, blob)
+
+    def close(self):
+        self.archive.close()
+
+def save_document(document, stream):
+    """Save a python-docx document as ``Document.save`` does, with fixed entry timestamps.
+
+    zipfile stamps every entry with the current time, so the same document
+    saved a second later would differ byte for byte. Follows
+    ``OpcPackage.save`` and ``PackageWriter.write`` of python-docx 0.8.
+    """
+    package = document.part.package
+    parts = package.parts
+    for part in parts:
+        part.before_marshal()
+    writer = _ZipStreamPackageWriter(stream)
+    PackageWriter._write_content_types_stream(writer, parts)
+    PackageWriter._write_pkg_rels(writer, package.rels)
+    PackageWriter._write_parts(writer, parts)
+    writer.close()
+
+class DocxSkeleton:
+    """A laid-out DOCX package for a model, built once per worker.
+
+    Static blocks are fully rendered; blocks with fields are present as
+    formatted but empty paragraphs, listed in ``slots`` with the index of
+    their first paragraph. Generators clone the document part and only fill
+    the slots; styles, settings and the other package parts are shared
+    read-only between the clones.
+    """
+
+    def __init__(self, document, slots: tuple):
+        self.document = document
+        self.slots = slots
+        main_part = document.part
+        self._shared_parts = tuple(part for part in main_part.package.iter_parts() if part is not main_part)
+
+    def clone(self):
+        memo = {id(part): part for part in self._shared_parts}
+        return copy.deepcopy(self.document.part, memo).document
+
+class DocxGenerator(BaseDocumentGenerator):
+    mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    extension = 'docx'
+    output_format = OutputFormat.DOCX
+    _skeletons = {}
+    _skeleton_lock = threading.Lock()
+
+    def __init__(self, form_data: dict, form_type: FormType = FormType.DHA_LICENSE_A, context: dict = None):
+        super().__init__(form_data, form_type, context)
+        self.skeleton = self._get_skeleton()
+        self.document = self.skeleton.clone()
+        self._filled = False
+
+    def _get_skeleton(self) -> DocxSkeleton:
+        skeleton = self._skeletons.get(self.form_type)
+        if skeleton is None:
+            with self._skeleton_lock:
+                skeleton = self._skeletons.get(self.form_type)
+                if skeleton is None:
+                    skeleton = self._build_skeleton()
+                    self._skeletons[self.form_type] = skeleton
+        return skeleton
+
+    def _base_document(self):
+        """Open the form type's DOCX template for its styles and page setup, or a blank document"""
+        template = Config.DOCUMENT_TYPES.get(self.form_type, {}).get('template')
+        template_path = os.path.join(Config.DOCX_TEMPLATE_FOLDER, template) if template else None
+        if template_path and os.path.exists(template_path):
+            document = Document(template_path)
+            body = document.element.body
+            for element in list(body):
+                if element.tag != qn('w:sectPr'):
+                    body.remove(element)
+            return document
+        self.document = Document()
+        self._setup_document()
+        return self.document
+
+    def _build_skeleton(self) -> DocxSkeleton:
+        self.document = self._base_document()
+        body = self.document.element.body
+        slots = []
+        for block in self.model:
+            texts = self._paragraph_texts(block)
+            if not block.is_static:
+                slots.append((block, len(body.p_lst)))
+                texts = [""] * len(texts)
+            self._render_block(block, texts)
+        return DocxSkeleton(self.document, tuple(slots))
+    
+    def _setup_document(self):
+        sections = self.document.sections
+        for section in sections:
+            section.top_margin = Inches(1)
+            section.bottom_margin = Inches(1)
+            section.left_margin = Inches(1)
+            section.right_margin = Inches(1)
+        self.document.styles['Normal'].font.size = Pt(12)
+    
+    def _add_paragraph(self, text: str = "", alignment: WD_ALIGN_PARAGRAPH = WD_ALIGN_PARAGRAPH.JUSTIFY):
+        paragraph = self.document.add_paragraph()
+        paragraph.alignment = alignment
+        if text:
+            _append_run_text(paragraph.add_run()._r, text)
+        return paragraph
+
+    def _paragraph_texts(self, block) -> list:
+        """Text of each paragraph a block renders to"""
+        kind = block.kind
+        if kind == BlockKind.SIGNATURE:
+            texts = []
+            for row in block.rows:
+                line = resolve(row.left, self.context)
+                texts.append(f"{line}\t{row.right}" if row.right else line)
+            return texts
+        elif kind == BlockKind.SPACER:
+            return [""]
+        elif kind == BlockKind.DIVIDER:
+            return [DIVIDER]
+        elif kind == BlockKind.PAGE_BREAK:
+            return [block.label]
+        elif kind in (BlockKind.CLAUSE, BlockKind.SUBCLAUSE):
+            return [f"{block.label}\t{resolve(block.segments, self.context)}"]
+        return [resolve(block.segments, self.context)]
+
+    def _render_block(self, block, texts: list):
+        kind = block.kind
+        if kind == BlockKind.SPACER:
+            self._add_paragraph().paragraph_format.line_spacing = Pt(block.size)
+        elif kind in (BlockKind.TITLE, BlockKind.DIVIDER):
+            self._add_paragraph(texts[0], WD_ALIGN_PARAGRAPH.CENTER)
+        elif kind == BlockKind.HEADING:
+            for run in self._add_paragraph(texts[0], WD_ALIGN_PARAGRAPH.CENTER).runs:
+                run.bold = True
+        elif kind == BlockKind.PAGE_BREAK:
+            self._add_paragraph(texts[0], WD_ALIGN_PARAGRAPH.LEFT).paragraph_format.page_break_before = True
+        elif kind == BlockKind.BODY:
+            self._add_paragraph(texts[0]).paragraph_format.first_line_indent = Inches(0.5)
+        elif kind in (BlockKind.CLAUSE, BlockKind.SUBCLAUSE):
+            paragraph_format = self._add_paragraph(texts[0]).paragraph_format
+            paragraph_format.left_indent = Inches(0.5 if kind == BlockKind.CLAUSE else 1)
+            paragraph_format.first_line_indent = Inches(-0.5)
+        elif kind == BlockKind.SCHEDULE:
+            self._add_paragraph(texts[0], WD_ALIGN_PARAGRAPH.LEFT)
+        elif kind == BlockKind.SIGNATURE:
+            for row, text in zip(block.rows, texts):
+                paragraph_format = self._add_paragraph(text, WD_ALIGN_PARAGRAPH.LEFT).paragraph_format
+                paragraph_format.left_indent = Inches(0.5 * row.indent)
+                paragraph_format.space_after = Pt(0)
+                if row.right:
+                    paragraph_format.tab_stops.add_tab_stop(Inches(6.5), WD_TAB_ALIGNMENT.RIGHT)
+
+    def generate(self) -> str:
+        if self._filled:
+            return ""
+        paragraphs = self.document.element.body.p_lst
+        for block, start in self.skeleton.slots:
+            for paragraph, text in zip(paragraphs[start:], self._paragraph_texts(block)):
+                if text:
+                    _append_run_text(paragraph.add_r(), text)
+        self._filled = True
+        return ""
+
+    def write(self, stream):
+        with self._timer('generate'):
+            self.generate()
+        with self._timer('serialize'):
+            save_document(self.document, stream)
+        
+        
+class DocxPackageTemplate:
+    """The serialized parts of a DocxSkeleton, for writing DOCX files without python-docx.
+
+    Every part other than ``word/document.xml`` is kept pre-compressed and
+    copied unchanged into each archive. The document part is kept as the
+    static XML chunks between its fillable paragraphs.
+    """
+    SLOT_MARKER = "__DOCX_SLOT__"
+
+    def __init__(self, entries: tuple, document_chunks: tuple):
+        self.entries = entries
+        self.document_chunks = document_chunks
+
+    @classmethod
+    def from_generator(cls, generator) -> 'DocxPackageTemplate':
+        skeleton = generator.skeleton
+        marked = skeleton.clone()
+        paragraphs = marked.element.body.p_lst
+        for block, start in skeleton.slots:
+            for paragraph in paragraphs[start:start + len(generator._paragraph_texts(block))]:
+                _append_run_text(paragraph.add_r(), cls.SLOT_MARKER)
+        buffer = io.BytesIO()
+        marked.save(buffer)
+        entries = []
+        document_chunks = ()
+        with zipfile.ZipFile(buffer) as archive:
+            for name in archive.namelist():
+                data = archive.read(name)
+                if name == 'word/document.xml':
+                    marker_run = f"<w:r><w:t>{cls.SLOT_MARKER}</w:t></w:r>".encode('utf-8')
+                    document_chunks = tuple(data.split(marker_run))
+                    entries.append((name, None))
+                else:
+                    entries.append((name, deflate(data)))
+        return cls(tuple(entries), document_chunks)
+
+def _run_xml(text: str) -> bytes:
+    """Serialize a run exactly as ``_append_run_text`` and lxml would"""
+    parts = ['<w:r>']
+    for line_number, line in enumerate(XML_ILLEGAL_CHARACTERS.sub('', text).split('\n')):
+        if line_number:
+            parts.append('<w:br/>')
+        for chunk_number, chunk in enumerate(line.split('\t')):
+            if chunk_number:
+                parts.append('<w:tab/>')
+            if chunk:
+                space = ' xml:space="preserve"' if chunk[0] == ' ' or chunk[-1] == ' ' else ''
+                # lxml writes carriage returns as character references, which parsers keep
+                parts.append(f'<w:t{space}>{xml_escape(chunk, CARRIAGE_RETURN)}</w:t>')
+    parts.append('</w:r>')
+    return ''.join(parts).encode('utf-8')
+
+class DocxStreamGenerator(DocxGenerator):
+    """DOCX backend that streams the package straight into a ZIP archive.
+
+    Produces the same ``word/document.xml`` as DocxGenerator but never
+    builds an lxml tree per document: static XML chunks and escaped field
+    runs are written in order, and the other parts are copied pre-compressed.
+    """
+    _packages = {}
+    _package_lock = threading.Lock()
+
+    def __init__(self, form_data: dict, form_type: FormType = FormType.DHA_LICENSE_A, context: dict = None):
+        BaseDocumentGenerator.__init__(self, form_data, form_type, context)
+        self.skeleton = self._get_skeleton()
+        self.package = self._get_package()
+
+    def _get_package(self) -> DocxPackageTemplate:
+        package = self._packages.get(self.form_type)
+        if package is None:
+            with self._package_lock:
+                package = self._packages.get(self.form_type)
+                if package is None:
+                    package = DocxPackageTemplate.from_generator(self)
+                    self._packages[self.form_type] = package
+        return package
+
+    def _document_xml(self):
+        chunks = iter(self.package.document_chunks)
+        for block, _ in self.skeleton.slots:
+            for text in self._paragraph_texts(block):
+                yield next(chunks)
+                if text:
+                    yield _run_xml(text)
+        yield next(chunks)
+
+    def generate(self) -> str:
+        return ""
+
+    def write(self, stream):
+        # Text is filled in while the package is written, so both count as serialization
+        with self._timer('serialize'), ZipStreamWriter(stream) as archive:
+            for name, payload in self.package.entries:
+                if payload is None:
+                    archive.write_stream(name, self._document_xml())
+                else:
+                    archive.write_deflated(name, *payload)
+
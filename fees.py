@@ -0,0 +1,121 @@
+"""Premium and ground rent totals for a plot, in exact Decimal arithmetic.
+
+The license states rates: rupees per square yard for the premium and paisas
+per square yard per annum for the ground rent. ``compute_fees`` turns them into
+the amounts payable; ``compute_columns`` does the same for a whole batch at once,
+and ``instalment_schedule`` splits the premium into the instalments it is paid in.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from number_words import rupees_to_words
+
+PAISA = Decimal('0.01')
+PAISAS_PER_RUPEE = Decimal(100)
+
+# Context fields added to every document
+FEE_FIELDS = ('total_premium', 'total_premium_words', 'annual_ground_rent', 'annual_ground_rent_words', 'premium_terms')
+
+LUMP_SUM = 'in lump sum before execution of this licence agreement'
+
+
+def to_decimal(value):
+    """A form value as a Decimal, or None if it is not a number"""
+    if isinstance(value, Decimal):
+        return value
+    try:
+        return Decimal(str(value).replace(',', '').strip())
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _usable(area, premium, ground_rent) -> bool:
+    """Inputs that give fees: all numbers, finite and not negative"""
+    return (area is not None and premium is not None and ground_rent is not None
+            and area.is_finite() and premium.is_finite() and ground_rent.is_finite()
+            and not (area.is_signed() or premium.is_signed() or ground_rent.is_signed()))
+
+
+def compute_fees(plot_area, premium_rate, ground_rent_rate):
+    """``(total_premium, annual_ground_rent)`` in rupees, or ``(None, None)`` if an input is not a usable number"""
+    totals, ground_rents = compute_columns((plot_area,), (premium_rate,), (ground_rent_rate,))
+    return totals[0], ground_rents[0]
+
+
+def compute_columns(plot_areas, premium_rates, ground_rent_rates):
+    """``compute_fees`` over whole columns: returns the list of total premiums and the list of annual ground rents"""
+    quantize = Decimal.quantize
+    totals, ground_rents = [], []
+    append_total, append_ground_rent = totals.append, ground_rents.append
+    for area, premium, ground_rent in zip(map(to_decimal, plot_areas), map(to_decimal, premium_rates),
+                                          map(to_decimal, ground_rent_rates)):
+        if _usable(area, premium, ground_rent):
+            try:
+                total = quantize(area * premium, PAISA, ROUND_HALF_UP)
+                annual = quantize(area * ground_rent / PAISAS_PER_RUPEE, PAISA, ROUND_HALF_UP)
+            except InvalidOperation:
+                # Amounts too large to state to the paisa
+                total = annual = None
+        else:
+            total = annual = None
+        append_total(total)
+        append_ground_rent(annual)
+    return totals, ground_rents
+
+
+def instalment_schedule(total: Decimal, count: int) -> list:
+    """Split an amount into ``count`` instalments of whole paisas; the first absorbs any remainder"""
+    if count < 1:
+        raise ValueError(f"Instalment count must be at least 1, not {count}")
+    paisas = int(total / PAISA)
+    share, remainder = divmod(paisas, count)
+    return [(share + (remainder if index == 0 else 0)) * PAISA for index in range(count)]
+
+
+def format_amount(amount: Decimal) -> str:
+    """An amount in figures grouped in lakhs and crores, as its words are: 25,00,000.00"""
+    whole, fraction = f"{amount:.2f}".split('.')
+    if len(whole) > 3:
+        head, tail = whole[:-3], whole[-3:]
+        pairs = []
+        while len(head) > 2:
+            head, pair = head[:-2], head[-2:]
+            pairs.insert(0, pair)
+        whole = ','.join([head] + pairs + [tail])
+    return f"{whole}.{fraction}"
+
+
+def premium_terms(total_premium, instalments: int = 1) -> str:
+    """How the premium is paid, as worded in the licence: in lump sum, or its instalment schedule"""
+    if instalments < 1:
+        raise ValueError(f"Instalment count must be at least 1, not {instalments}")
+    if instalments == 1:
+        return LUMP_SUM
+    if total_premium is None:
+        return f"in {instalments} instalments, the first before execution of this licence agreement"
+    first, rest = instalment_schedule(total_premium, instalments)[:2]
+    return (f"in {instalments} instalments, the first of Rs.{format_amount(first)} ({rupees_to_words(first)}) "
+            f"before execution of this licence agreement and the remaining {instalments - 1} of "
+            f"Rs.{format_amount(rest)} ({rupees_to_words(rest)}) each as called by the 1st Party")
+
+
+def fee_context(form_data: dict, instalments: int = 1) -> dict:
+    """The fee fields a document is rendered with.
+
+    Decimal totals already in ``form_data`` (precomputed for a batch) are
+    used as they are; otherwise they are computed from the rates. Fields
+    are blank when the plot area or a rate is not a number, is negative,
+    or gives an amount too large to state; the premium terms then leave
+    out the instalment amounts.
+    """
+    total_premium, annual_ground_rent = form_data.get('total_premium'), form_data.get('annual_ground_rent')
+    if not isinstance(total_premium, Decimal) or not isinstance(annual_ground_rent, Decimal):
+        total_premium, annual_ground_rent = compute_fees(
+            form_data.get('plot_area'), form_data.get('premium_rate'), form_data.get('ground_rent_rate'))
+    if total_premium is None:
+        return dict(dict.fromkeys(FEE_FIELDS, ''), premium_terms=premium_terms(None, instalments))
+    return {
+        'total_premium': format_amount(total_premium),
+        'total_premium_words': rupees_to_words(total_premium),
+        'annual_ground_rent': format_amount(annual_ground_rent),
+        'annual_ground_rent_words': rupees_to_words(annual_ground_rent),
+        'premium_terms': premium_terms(total_premium, instalments)
+    }
@@ -1,9 +1,13 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, DateField, DecimalField, TextAreaField, SelectField
-from wtforms.validators import DataRequired, Email
+from wtforms.validators import DataRequired, Email, Regexp
 from datetime import datetime
 from config import FormType, Config
 
+# Pakistani CNIC: 5-digit region code, 7-digit number and a check digit
+CNIC_PATTERN = r'^\d{5}-\d{7}-\d$'
+CNIC_MESSAGE = 'CNIC must be in the format #####-#######-#.'
+
 class FormSelector(FlaskForm):
     form_type = SelectField('Select Document Type', 
                           choices=[(form_type.name, form_type.value) for form_type in FormType],
@@ -102,7 +106,7 @@ class DHALicenseForm(FlaskForm):
                                   validators=[DataRequired()],
                                   default=Config.DEFAULT_VALUES[FormType.DHA_LICENSE_A]['witness1_address'])
     witness1_cnic = StringField('Witness 1 CNIC',
-                             validators=[DataRequired()],
+                             validators=[DataRequired(), Regexp(CNIC_PATTERN, message=CNIC_MESSAGE)],
                              default=Config.DEFAULT_VALUES[FormType.DHA_LICENSE_A]['witness1_cnic'])
     
     witness2_name = StringField('Witness 2 Name',
@@ -112,7 +116,7 @@ class DHALicenseForm(FlaskForm):
                                   validators=[DataRequired()],
                                   default=Config.DEFAULT_VALUES[FormType.DHA_LICENSE_A]['witness2_address'])
     witness2_cnic = StringField('Witness 2 CNIC',
-                             validators=[DataRequired()],
+                             validators=[DataRequired(), Regexp(CNIC_PATTERN, message=CNIC_MESSAGE)],
                              default=Config.DEFAULT_VALUES[FormType.DHA_LICENSE_A]['witness2_cnic'])
 
 class FormFactory:
@@ -121,11 +125,11 @@ class FormFactory:
     }
     
     @staticmethod
-    def create_form(form_type: FormType) -> FlaskForm:
+    def create_form(form_type: FormType, **kwargs) -> FlaskForm:
         form_class = FormFactory._forms.get(form_type)
         if not form_class:
             raise ValueError(f"No form class registered for form type: {form_type}")
-        return form_class()
+        return form_class(**kwargs)
     
     @staticmethod
     def register_form(form_type: FormType, form_class: FlaskForm):
@@ -1,7 +1,30 @@
-bind = "0.0.0.0:10000"
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
 workers = 4
 threads = 2
 timeout = 120
 accesslog = "-"
 errorlog = "-"
-capture_output = True 
\ No newline at end of file
+capture_output = True
+
+# Load the app once in the master so workers share its memory copy-on-write
+preload_app = True
+
+def warm_up():
+    """Import the backends, compile templates and fill the per-process document caches"""
+    from config import Config
+    from document_generator import warm_up_generators
+    warm_up_generators(Config.WARM_UP_FORMATS)
+
+def on_starting(server):
+    if server.cfg.preload_app:
+        warm_up()
+        # Keep the warmed objects out of later collections, which would otherwise
+        # touch their pages and undo the copy-on-write sharing
+        gc.freeze()
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        warm_up()
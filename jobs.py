@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from config import Config, FormType
+from document_generator import DocumentGeneratorFactory
+from batch import read_rows, validate_row, write_batch
+from document_store import document_store
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+PROGRESS_INTERVAL = 1.0  # Seconds between progress writes while a batch renders
+
+# Job kinds
+DOCUMENT = 'document'
+BATCH = 'batch'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    form_type TEXT NOT NULL,
+    output_format TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    result_path TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+class JobQueue:
+    """Background document generation with job state persisted in SQLite.
+
+    Jobs are claimed from the database, so any number of processes can run
+    dispatchers against the same file: the web workers themselves, or
+    standalone ``python jobs.py`` workers. A running job refreshes its
+    ``updated_at`` as it progresses; one that has not been touched for
+    ``lease_seconds`` is assumed lost with its process and is claimed again,
+    which is how jobs interrupted by a restart are resumed.
+    """
+
+    def __init__(self, database: str, input_dir: str, workers: int = 1, lease_seconds: int = 600):
+        self.database = database
+        self.input_dir = input_dir
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.app = None
+        self._wakeup = threading.Event()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._initialized = False
+
+    def init_app(self, app):
+        self.app = app
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.database) or '.', exist_ok=True)
+            os.makedirs(self.input_dir, exist_ok=True)
+        connection = sqlite3.connect(self.database, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        if not self._initialized:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            self._initialized = True
+        return connection
+
+    def submit(self, kind: str, form_type: FormType, output_format: str, payload: dict, job_id: str = None) -> str:
+        job_id = job_id or self.new_id()
+        now = time.time()
+        total = 1 if kind == DOCUMENT else None
+        connection = self._connect()
+        try:
+            connection.execute(
+                'INSERT INTO jobs (id, kind, form_type, output_format, payload, status, total, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, form_type.name, output_format, json.dumps(payload), QUEUED, total, now, now)
+            )
+        finally:
+            connection.close()
+        self.ensure_started()
+        self._wakeup.set()
+        return job_id
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def input_path(self, job_id: str, extension: str) -> str:
+        """Where an uploaded batch file is kept until its job has run; results go to the document store"""
+        return os.path.join(self.input_dir, f"{job_id}.input.{extension}")
+
+    def get(self, job_id: str):
+        connection = self._connect()
+        try:
+            row = connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            connection.close()
+        return dict(row) if row else None
+
+    def _update(self, job_id: str, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        connection = self._connect()
+        try:
+            connection.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+        finally:
+            connection.close()
+
+    def claim(self):
+        """Mark the oldest queued (or abandoned) job as running and return it"""
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT * FROM jobs WHERE status = ? OR (status = ? AND updated_at < ?) '
+                'ORDER BY created_at LIMIT 1',
+                (QUEUED, RUNNING, now - self.lease_seconds)
+            ).fetchone()
+            if row is not None:
+                connection.execute('UPDATE jobs SET status = ?, progress = 0, updated_at = ? WHERE id = ?',
+                                   (RUNNING, now, row['id']))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+        return dict(row) if row else None
+
+    def _run_document(self, job: dict, form_type: FormType, payload: dict) -> str:
+        form_data, errors = validate_row(form_type, payload['form_data'])
+        if errors:
+            raise ValueError('; '.join(f"{name}: {' '.join(messages)}" for name, messages in errors.items()))
+        generator = DocumentGeneratorFactory.create_generator(form_type, form_data, job['output_format'])
+        with document_store.create(form_type, generator.extension, job['id'], form_data.get('plot_number')) as (document_id, f):
+            generator.write(f)
+        return document_store.path(document_id, generator.extension)
+
+    def _run_batch(self, job: dict, form_type: FormType, payload: dict) -> str:
+        input_path, input_format = payload['input_path'], payload['input_format']
+        with open(input_path, 'rb') as source:
+            self._update(job['id'], total=sum(1 for _ in read_rows(source, input_format)))
+        with open(input_path, 'rb') as source, document_store.create(form_type, 'zip', job['id']) as (document_id, target):
+            rows = read_rows(source, input_format)
+            reported = time.monotonic()
+            for number in write_batch(target, form_type, rows, job['output_format']):
+                if number is not None and time.monotonic() - reported >= PROGRESS_INTERVAL:
+                    self._update(job['id'], progress=number)
+                    reported = time.monotonic()
+        os.remove(input_path)
+        return document_store.path(document_id, 'zip')
+
+    def run(self, job: dict):
+        """Render a claimed job and record its result or error"""
+        payload = json.loads(job['payload'])
+        try:
+            form_type = FormType[job['form_type']]
+            with self.app.app_context():
+                if job['kind'] == BATCH:
+                    path = self._run_batch(job, form_type, payload)
+                else:
+                    path = self._run_document(job, form_type, payload)
+        except Exception as e:
+            self._update(job['id'], status=FAILED, error=str(e))
+            return
+        job = self.get(job['id'])
+        self._update(job['id'], status=DONE, result_path=path, progress=job['total'])
+
+    def work(self, stop: threading.Event = None, poll_seconds: float = 5):
+        """Claim and run jobs until ``stop`` is set, sleeping when the queue is empty"""
+        while stop is None or not stop.is_set():
+            job = self.claim()
+            if job is None:
+                self._wakeup.wait(poll_seconds)
+                self._wakeup.clear()
+                continue
+            self.run(job)
+
+    def ensure_started(self):
+        """Start the job threads in this process unless JOB_WORKERS is 0; threads do not survive the fork into web workers"""
+        if self.workers <= 0 or self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._wakeup = threading.Event()
+            for index in range(self.workers):
+                threading.Thread(target=self.work, name=f"job-worker-{index}", daemon=True).start()
+            self._started_pid = os.getpid()
+
+
+job_queue = JobQueue(
+    Config.JOB_DATABASE,
+    os.path.join(Config.DATA_FOLDER, 'jobs'),
+    Config.JOB_WORKERS,
+    Config.JOB_LEASE_SECONDS
+)
+
+
+if __name__ == '__main__':
+    # Standalone worker, e.g. alongside web workers started with JOB_WORKERS=0
+    from app import app
+    job_queue.init_app(app)
+    try:
+        job_queue.work()
+    except KeyboardInterrupt:
+        sys.exit(0)
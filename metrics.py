@@ -0,0 +1,135 @@
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+from config import Config
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_LABELS = ('stage', 'form_type', 'output_format')
+
+_NULL_TIMER = nullcontext()
+
+
+def _escape(value) -> str:
+    """A label value as the text format requires: backslash, double quote and line feed escaped"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _header_text(value) -> str:
+    """Text for a quoted string in a header: printable ASCII only, with backslash and double quote escaped"""
+    text = ''.join(character for character in str(value) if ' ' <= character <= '~')
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observations, per combination of label values"""
+
+    def __init__(self, name: str, documentation: str, labels: tuple, buckets: tuple = BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Counts per bucket plus one for +Inf, then the sum of observations
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _label_text(self, label_values: tuple, extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}'
+
+    def exposition(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((label_values, list(counts), total) for label_values, (counts, total) in self._series.items())
+        for label_values, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{self._label_text(label_values, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(label_values)} {total}")
+            lines.append(f"{self.name}_count{self._label_text(label_values)} {cumulative}")
+        return lines
+
+
+class _StageTimer:
+    __slots__ = ('metrics', 'stage', 'form_type', 'output_format', 'start')
+
+    def __init__(self, metrics, stage, form_type, output_format):
+        self.metrics = metrics
+        self.stage = stage
+        self.form_type = form_type
+        self.output_format = output_format
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.observe(self.stage, self.form_type, self.output_format, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Timings of the stages a license goes through, from form validation to serialization.
+
+    Each stage is recorded in a histogram labelled by form type and output
+    format, exposed in the Prometheus text format by ``exposition``. Stages
+    timed on a request's own thread are also kept for its ``Server-Timing``
+    header. Histograms are per process. When disabled, ``timer`` returns a
+    shared no-op context manager and nothing is recorded.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages = Histogram('license_stage_seconds', 'Time spent in each stage of producing a license document',
+                                STAGE_LABELS)
+        self._request = threading.local()
+
+    def timer(self, stage: str, form_type, output_format=None):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage, form_type, output_format)
+
+    def observe(self, stage: str, form_type, output_format, seconds: float):
+        form_type = getattr(form_type, 'name', form_type) or ''
+        output_format = getattr(output_format, 'value', output_format) or ''
+        self.stages.observe((stage, form_type, output_format), seconds)
+        timings = getattr(self._request, 'timings', None)
+        if timings is not None:
+            timings.append((stage, output_format, seconds))
+
+    def start_request(self):
+        """Begin collecting this thread's stage timings for a response's Server-Timing header"""
+        self._request.timings = []
+        self._request.start = time.perf_counter()
+
+    def server_timing(self):
+        """Server-Timing header value for the current request, or None if nothing was timed"""
+        timings = getattr(self._request, 'timings', None)
+        self._request.timings = None
+        if not timings:
+            return None
+        entries = [f'{stage};desc="{_header_text(output_format)}";dur={seconds * 1000:.2f}' if output_format
+                   else f'{stage};dur={seconds * 1000:.2f}' for stage, output_format, seconds in timings]
+        entries.append(f'total;dur={(time.perf_counter() - self._request.start) * 1000:.2f}')
+        return ', '.join(entries)
+
+    def exposition(self) -> str:
+        return '\n'.join(self.stages.exposition()) + '\n'
+
+
+metrics = Metrics(Config.METRICS_ENABLED)
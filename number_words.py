@@ -0,0 +1,73 @@
+"""Numbers, years, ordinal days and rupee amounts in words, as written in the license text.
+
+Conversions are memoized process-wide; a license repeats the same handful of
+numbers, so after warm-up each lookup is a cache hit.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+ONES = ('zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten',
+        'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen')
+TENS = ('', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety')
+
+# Group names, largest first: years and counts use thousands and millions, amounts lakhs and crores
+INTERNATIONAL = ((10 ** 9, 'billion'), (10 ** 6, 'million'), (1000, 'thousand'))
+SOUTH_ASIAN = ((10 ** 7, 'crore'), (10 ** 5, 'lakh'), (1000, 'thousand'))
+
+PAISA = Decimal('0.01')
+
+
+def _below_hundred(number: int) -> str:
+    if number < 20:
+        return ONES[number]
+    tens, ones = divmod(number, 10)
+    return f"{TENS[tens]} {ONES[ones]}" if ones else TENS[tens]
+
+
+@lru_cache(maxsize=4096)
+def number_to_words(number: int, scale: tuple = INTERNATIONAL) -> str:
+    """British English words for a whole number, e.g. 2026 -> 'two thousand and twenty six'"""
+    if number < 0:
+        return f"minus {number_to_words(-number, scale)}"
+    if number < 100:
+        return _below_hundred(number)
+    parts = []
+    for size, name in scale:
+        if number >= size:
+            count, number = divmod(number, size)
+            parts.append(f"{number_to_words(count, scale)} {name}")
+    if number >= 100:
+        hundreds, number = divmod(number, 100)
+        parts.append(f"{ONES[hundreds]} hundred")
+    if number:
+        # 'and' before the last part, as in "two thousand and five" or "one hundred and ten"
+        parts.append(f"and {_below_hundred(number)}" if parts else _below_hundred(number))
+    return ' '.join(parts)
+
+
+@lru_cache(maxsize=256)
+def year_to_words(year: int) -> str:
+    return number_to_words(year)
+
+
+@lru_cache(maxsize=64)
+def ordinal(number: int) -> str:
+    """A day of the month or other count as an ordinal: 1st, 2nd, 3rd, 11th, 22nd..."""
+    if 10 <= number % 100 <= 20:
+        suffix = 'th'
+    else:
+        suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
+
+
+@lru_cache(maxsize=4096)
+def rupees_to_words(amount) -> str:
+    """A rupee amount in words with lakhs and crores, e.g. 'rupees two lakh fifty thousand and fifty paisas only'"""
+    amount = Decimal(str(amount)).quantize(PAISA, rounding=ROUND_HALF_UP)
+    if amount < 0:
+        return f"minus {rupees_to_words(-amount)}"
+    rupees, paisas = divmod(int(amount * 100), 100)
+    words = f"rupees {number_to_words(rupees, SOUTH_ASIAN)}"
+    if paisas:
+        words += f" and {number_to_words(paisas)} paisa{'s' if paisas != 1 else ''}"
+    return f"{words} only"
@@ -0,0 +1,225 @@
+from config import FormType, Config
+import functools
+import copy
+from xml.sax.saxutils import escape as xml_escape
+from document_model import BlockKind, resolve
+from document_generator import BaseDocumentGenerator, StaticBlockCache, OutputFormat, DIVIDER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+
+def _build_pdf_stylesheet():
+    """Setup custom styles for the PDF document"""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='DHATitle',
+        parent=styles['Title'],
+        fontSize=14,
+        spaceAfter=6,
+        alignment=TA_CENTER,
+        leading=16
+    ))
+    styles.add(ParagraphStyle(
+        name='DHASubTitle',
+        parent=styles['Title'],
+        fontSize=12,
+        spaceAfter=4,
+        alignment=TA_CENTER,
+        leading=14
+    ))
+    styles.add(ParagraphStyle(
+        name='DHABody',
+        parent=styles['Normal'],
+        fontSize=11,
+        leading=13,
+        spaceAfter=24,
+        alignment=TA_JUSTIFY,
+        firstLineIndent=36  # Add indentation for paragraphs
+    ))
+    styles.add(ParagraphStyle(
+        name='DHAHeading',
+        parent=styles['Heading1'],
+        fontSize=12,
+        spaceAfter=12,
+        alignment=TA_CENTER,
+        leading=14
+    ))
+    styles.add(ParagraphStyle(
+        name='DHAPageNumber',
+        parent=styles['Normal'],
+        fontSize=11,
+        alignment=TA_LEFT,
+        leading=14,
+        leftIndent=36,
+        spaceAfter=12
+    ))
+    styles.add(ParagraphStyle(
+        name='DHAClause',
+        parent=styles['Normal'],
+        fontSize=11,
+        leading=13,
+        spaceAfter=24,
+        alignment=TA_JUSTIFY,
+        leftIndent=36,
+        firstLineIndent=-36
+    ))
+    styles.add(ParagraphStyle(
+        name='DHASubClause',
+        parent=styles['DHAClause'],
+        spaceAfter=6,
+        leftIndent=72
+    ))
+    styles.add(ParagraphStyle(
+        name='DHASchedule',
+        parent=styles['Normal'],
+        fontSize=11,
+        leading=13,
+        alignment=TA_LEFT
+    ))
+    styles.add(ParagraphStyle(
+        name='DHASignature',
+        parent=styles['DHASchedule']
+    ))
+    styles.add(ParagraphStyle(
+        name='DHASignatureRight',
+        parent=styles['DHASchedule'],
+        alignment=TA_CENTER
+    ))
+    return styles
+
+@functools.lru_cache(maxsize=None)
+def get_pdf_stylesheet():
+    """The DHA stylesheet, built once per process and shared read-only by every PDFGenerator"""
+    return _build_pdf_stylesheet()
+
+def warm_up_pdf():
+    """Build the stylesheet and load the metrics of every font it uses, e.g. at worker start"""
+    for name, path in Config.PDF_FONTS.items():
+        if name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(name, path))
+    styles = get_pdf_stylesheet()
+    for style in styles.byName.values():
+        if isinstance(style, ParagraphStyle):
+            pdfmetrics.stringWidth(DIVIDER, style.fontName, style.fontSize)
+
+class PrewrappedParagraph(Paragraph):
+    """A static paragraph whose line breaking is done once per available width.
+
+    Shallow copies share the layout cache, so the first story to lay the
+    paragraph out pays for breaking its lines and every later story reuses them.
+    """
+
+    def __init__(self, text: str, style: ParagraphStyle, *args, **kwargs):
+        # Paragraph.split builds its halves through self.__class__ with extra arguments
+        super().__init__(text, style, *args, **kwargs)
+        self._layouts = {}
+
+    def wrap(self, availWidth, availHeight):
+        layout = self._layouts.get(availWidth)
+        if layout is None:
+            width, height = super().wrap(availWidth, availHeight)
+            self._layouts[availWidth] = (width, height, self._wrapWidths, self.blPara)
+            return width, height
+        self.width, self.height, self._wrapWidths, self.blPara = layout
+        return self.width, self.height
+
+class PDFGenerator(BaseDocumentGenerator):
+    mimetype = 'application/pdf'
+    extension = 'pdf'
+    output_format = OutputFormat.PDF
+    _static_blocks = StaticBlockCache()
+
+    def __init__(self, form_data: dict, form_type: FormType = FormType.DHA_LICENSE_A, context: dict = None):
+        super().__init__(form_data, form_type, context)
+        self.styles = get_pdf_stylesheet()
+
+    BLOCK_STYLES = {
+        BlockKind.TITLE: 'DHATitle',
+        BlockKind.HEADING: 'DHAHeading',
+        BlockKind.DIVIDER: 'DHAHeading',
+        BlockKind.BODY: 'DHABody',
+        BlockKind.CLAUSE: 'DHAClause',
+        BlockKind.SUBCLAUSE: 'DHASubClause',
+        BlockKind.SCHEDULE: 'DHASchedule'
+    }
+
+    @staticmethod
+    def _markup(text: str) -> str:
+        return xml_escape(text).replace('\n', '<br/>')
+
+    def _signature_table(self, block, paragraph_class: type = Paragraph) -> Table:
+        width = A4[0] - 2 * inch
+        data = []
+        table_style = [
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('TOPPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 0)
+        ]
+        for index, row in enumerate(block.rows):
+            left = self._markup(resolve(row.left, self.context)) or '&nbsp;'
+            data.append([
+                paragraph_class(left, self.styles['DHASignature']),
+                paragraph_class(self._markup(row.right), self.styles['DHASignatureRight'])
+            ])
+            if row.indent:
+                table_style.append(('LEFTPADDING', (0, index), (0, index), 18 * row.indent))
+        table = Table(data, colWidths=[width * 0.55, width * 0.45], hAlign='LEFT')
+        table.setStyle(TableStyle(table_style))
+        return table
+
+    def _render_block(self, block, paragraph_class: type = Paragraph) -> list:
+        kind = block.kind
+        if kind == BlockKind.SPACER:
+            return [Spacer(1, block.size)]
+        elif kind == BlockKind.PAGE_BREAK:
+            return [PageBreak(), paragraph_class(block.label, self.styles['DHAPageNumber'])]
+        elif kind == BlockKind.SIGNATURE:
+            return [self._signature_table(block, paragraph_class)]
+        elif kind == BlockKind.DIVIDER:
+            text = DIVIDER
+        elif kind in (BlockKind.CLAUSE, BlockKind.SUBCLAUSE):
+            text = f"{block.label} {self._markup(resolve(block.segments, self.context))}"
+        else:
+            text = self._markup(resolve(block.segments, self.context))
+        return [paragraph_class(text, self.styles[self.BLOCK_STYLES[kind]])]
+
+    def _prerender(self, block):
+        # A shallow copy of a Table still shares its cell paragraphs, which are drawn
+        # with per-story state, so signature tables are built for every story instead
+        if block.kind == BlockKind.SIGNATURE:
+            return None
+        return self._render_block(block, PrewrappedParagraph)
+
+    def generate(self) -> list:
+        story = []
+        prerendered = self._static_blocks.get(self.form_type, self.model, self._prerender)
+        for block, flowables in zip(self.model, prerendered):
+            if flowables is None:
+                story.extend(self._render_block(block))
+            else:
+                # Layout state is stored on the flowable, so each story gets its own shallow copy
+                story.extend(copy.copy(flowable) for flowable in flowables)
+        return story
+    
+    def write(self, stream):
+        doc = SimpleDocTemplate(
+            stream,
+            pagesize=A4,
+            rightMargin=inch,
+            leftMargin=inch,
+            topMargin=inch,
+            bottomMargin=inch,
+            # Fixed creation date and document ID, so the same context always gives the same bytes
+            invariant=True
+        )
+        with self._timer('generate'):
+            story = self.generate()
+        with self._timer('serialize'):
+            doc.build(story)
+
@@ -0,0 +1,92 @@
+import cProfile
+import hmac
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from config import Config
+
+
+class ProfileRun:
+    """Context manager profiling a block with cProfile and saving the stats, if ``active``"""
+
+    def __init__(self, directory: str, label: str, active: bool):
+        self.active = active
+        self.filename = f"{time.strftime('%Y%m%d_%H%M%S')}_{label}_{uuid.uuid4().hex[:8]}.prof" if active else None
+        self._directory = directory
+        self._profile = None
+
+    def __enter__(self):
+        if self.active:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self._profile is not None:
+            self._profile.disable()
+            os.makedirs(self._directory, exist_ok=True)
+            self._profile.dump_stats(os.path.join(self._directory, self.filename))
+            self._profile = None
+        return False
+
+    def wrap(self, chunks):
+        """Profile a streamed response for as long as it is being iterated"""
+        with self:
+            yield from chunks
+
+
+class Profiler:
+    """Opt-in cProfile runs for individual generation requests.
+
+    A request is profiled when it carries the admin ``token`` in an
+    ``X-Profile-Token`` header, or is picked by ``sample_rate``; either way
+    at most ``max_per_minute`` requests are profiled per process. The token
+    is never taken from the URL, where access logs would record it. Stats
+    are written under ``directory`` as ``.prof`` files for ``pstats`` or
+    snakeviz, and are only served to requests carrying the token.
+    """
+
+    def __init__(self, directory: str, token: str = None, max_per_minute: int = 6, sample_rate: float = 0.0):
+        self.directory = directory
+        self.token = token
+        self.max_per_minute = max_per_minute
+        self.sample_rate = sample_rate
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def authorized(self, request) -> bool:
+        """Whether the request carries the admin token"""
+        supplied = request.headers.get('X-Profile-Token')
+        return bool(self.token and supplied
+                    and hmac.compare_digest(supplied.encode('utf-8'), self.token.encode('utf-8')))
+
+    def _requested(self, request) -> bool:
+        if self.authorized(request):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _allow(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_per_minute:
+                return False
+            self._recent.append(now)
+            return True
+
+    def for_request(self, request, label: str) -> ProfileRun:
+        """A ProfileRun that is active if this request asked to be, or was sampled, and is within the rate limit"""
+        active = self._requested(request) and self._allow()
+        return ProfileRun(self.directory, label, active)
+
+
+profiler = Profiler(
+    os.path.join(Config.DATA_FOLDER, 'profiles'),
+    Config.PROFILE_TOKEN,
+    Config.PROFILE_MAX_PER_MINUTE,
+    Config.PROFILE_SAMPLE_RATE
+)
@@ -0,0 +1,182 @@
+"""Validation of plain dict input (JSON, CSV rows) without WTForms.
+
+A form type's schema is derived once from its form class: each field's type
+and validators become a compiled check, applied to a row with no request
+context, CSRF token or field objects. The result matches what the form
+itself would produce: ``(form_data, errors)`` with errors keyed by field
+name, as in ``form.errors``.
+"""
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from wtforms import DateField, DecimalField, StringField
+from wtforms.fields.core import UnboundField
+from wtforms.validators import DataRequired, InputRequired, Length, NumberRange, Optional, Regexp
+from config import FormType
+from forms import FormFactory
+
+MISSING = 'This column is missing.'
+REQUIRED = 'This field is required.'
+INVALID_DATE = 'Not a valid date value.'
+INVALID_DECIMAL = 'Not a valid decimal value.'
+NOT_SCALAR = 'Must be a single value, not a list or object.'
+ISO_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+
+def _parse_string(value):
+    return value
+
+
+def _parse_iso_date(value):
+    if isinstance(value, date):
+        return value
+    match = ISO_DATE.fullmatch(value)
+    if match is None:
+        raise ValueError(INVALID_DATE)
+    try:
+        return date(int(match[1]), int(match[2]), int(match[3]))
+    except ValueError:
+        raise ValueError(INVALID_DATE)
+
+
+def _date_parser(date_format: str):
+    if date_format == '%Y-%m-%d':
+        return _parse_iso_date
+
+    def parse(value):
+        if isinstance(value, date):
+            return value
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            raise ValueError(INVALID_DATE)
+    return parse
+
+
+def _parse_decimal(value):
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValueError(INVALID_DECIMAL)
+    if not number.is_finite():
+        raise ValueError(INVALID_DECIMAL)
+    return number
+
+
+def _compile_validator(validator):
+    """A check of a parsed value that returns the validator's error message, or None if it passes"""
+    if isinstance(validator, Regexp):
+        regex, message = validator.regex, validator.message or 'Invalid input.'
+        return lambda value: None if regex.match(value or '') else message
+    if isinstance(validator, Length):
+        low, high = validator.min, validator.max
+        message = validator.message or f"Field must be between {low} and {high} characters long."
+        return lambda value: None if len(value) >= low and (high == -1 or len(value) <= high) else message
+    if isinstance(validator, NumberRange):
+        low, high = validator.min, validator.max
+        message = validator.message or f"Number must be between {low} and {high}."
+        return lambda value: None if (low is None or value >= low) and (high is None or value <= high) else message
+    raise TypeError(f"No compiled equivalent for the {type(validator).__name__} validator")
+
+
+class FieldSchema:
+    """One field's parser and checks, compiled from its unbound WTForms field"""
+    __slots__ = ('name', 'label', 'kind', 'required', 'parse', 'checks')
+
+    def __init__(self, name: str, unbound: UnboundField):
+        field_class = unbound.field_class
+        self.name = name
+        self.label = unbound.args[0] if unbound.args else unbound.kwargs.get('label', name)
+        validators = unbound.kwargs.get('validators') or (unbound.args[1] if len(unbound.args) > 1 else ())
+        self.required = any(isinstance(v, (DataRequired, InputRequired)) for v in validators)
+        self.checks = tuple(_compile_validator(v) for v in validators
+                            if not isinstance(v, (DataRequired, InputRequired, Optional)))
+        if issubclass(field_class, DateField):
+            self.kind = 'date'
+            formats = unbound.kwargs.get('format', '%Y-%m-%d')
+            self.parse = _date_parser(formats[0] if isinstance(formats, (list, tuple)) else formats)
+        elif issubclass(field_class, DecimalField):
+            self.kind = 'decimal'
+            self.parse = _parse_decimal
+        elif issubclass(field_class, StringField):
+            self.kind = 'string'
+            self.parse = _parse_string
+        else:
+            raise TypeError(f"Field {name}: no compiled equivalent for {field_class.__name__}")
+
+    def validate(self, raw):
+        """``(value, errors)`` for one raw input value, which is a string or a JSON scalar"""
+        if raw is None:
+            return None, [MISSING]
+        if raw.__class__ is not str:
+            # JSON objects and arrays would otherwise be str()-ed into the document
+            if isinstance(raw, (dict, list, tuple)):
+                return None, [NOT_SCALAR]
+            # Only dates for date fields and numbers for decimal fields are taken as they are
+            if self.kind == 'date' and isinstance(raw, date):
+                pass
+            elif self.kind == 'decimal' and isinstance(raw, (Decimal, int, float)) and not isinstance(raw, bool):
+                raw = repr(raw) if isinstance(raw, float) else raw
+            else:
+                raw = str(raw)
+        if raw.__class__ is str:
+            if not raw.strip():
+                return None, [REQUIRED] if self.required else ()
+            if self.kind != 'string':
+                raw = raw.strip()
+        try:
+            value = self.parse(raw)
+        except (ValueError, TypeError):
+            return None, [INVALID_DATE if self.kind == 'date' else INVALID_DECIMAL]
+        # DataRequired also rejects falsy values such as a zero rate
+        if self.required and not value:
+            return None, [REQUIRED]
+        if not self.checks:
+            return value, ()
+        return value, [message for message in (check(value) for check in self.checks) if message]
+
+    def describe(self) -> dict:
+        return {'name': self.name, 'label': self.label, 'type': self.kind, 'required': self.required}
+
+
+class FormSchema:
+    """The fields of a form type, in form order, for validating plain dicts"""
+
+    def __init__(self, form_type: FormType, form_class):
+        self.form_type = form_type
+        unbound = sorted(
+            ((name, value) for name in dir(form_class)
+             if not name.startswith('_') and isinstance(value := getattr(form_class, name), UnboundField)),
+            key=lambda item: item[1].creation_counter
+        )
+        self.fields = tuple(FieldSchema(name, field) for name, field in unbound)
+
+    def validate(self, row: dict):
+        """Returns ``(form_data, errors)``; form_data is None when the row is invalid"""
+        form_data, errors = {}, {}
+        for field in self.fields:
+            value, field_errors = field.validate(row.get(field.name))
+            if field_errors:
+                errors[field.name] = field_errors
+            else:
+                form_data[field.name] = value
+        if errors:
+            return None, errors
+        return form_data, {}
+
+    def describe(self) -> list:
+        return [field.describe() for field in self.fields]
+
+
+@lru_cache(maxsize=None)
+def get_schema(form_type: FormType) -> FormSchema:
+    form_class = FormFactory._forms.get(form_type)
+    if form_class is None:
+        raise ValueError(f"No form class registered for form type: {form_type}")
+    return FormSchema(form_type, form_class)
+
+
+def validate(form_type: FormType, row: dict):
+    """Validate a dict of field values against a form type's schema; see ``FormSchema.validate``"""
+    return get_schema(form_type).validate(row)
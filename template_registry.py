@@ -0,0 +1,93 @@
+import threading
+import jinja2
+from markupsafe import Markup, escape
+from config import Config
+
+
+def nl2br(value) -> Markup:
+    """Escape ``value`` and turn its line breaks into ``<br>`` tags."""
+    return Markup('<br>\n').join(escape(value).split('\n'))
+
+
+def md_breaks(value) -> str:
+    """Turn line breaks into Markdown hard breaks."""
+    return str(value).replace('\n', '  \n')
+
+
+class TemplateRegistry:
+    """Process-wide store of compiled Jinja2 templates.
+
+    Template sources are registered per (form type, output format) and
+    compiled on first use; every later lookup returns the same compiled
+    template, so a request only pays for variable substitution.
+    """
+
+    def __init__(self, bytecode_cache_dir: str = None):
+        self._sources = {}
+        self._compiled = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revision = 0  # Incremented whenever a template source changes
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache_dir)
+        self.environment = jinja2.Environment(
+            loader=jinja2.DictLoader(self._sources),
+            bytecode_cache=bytecode_cache,
+            cache_size=-1,
+            autoescape=jinja2.select_autoescape(['html'])
+        )
+        self.environment.filters['nl2br'] = nl2br
+        self.environment.filters['md_breaks'] = md_breaks
+
+    @staticmethod
+    def template_name(form_type, output_format) -> str:
+        return f"{form_type.name}.{output_format.value}"
+
+    def register(self, form_type, output_format, source: str):
+        name = self.template_name(form_type, output_format)
+        with self._lock:
+            if self._sources.get(name) != source:
+                self._sources[name] = source
+                self._compiled.pop(name, None)
+                self.revision += 1
+
+    def source(self, form_type, output_format) -> str:
+        return self._sources.get(self.template_name(form_type, output_format), '')
+
+    def get(self, form_type, output_format) -> jinja2.Template:
+        name = self.template_name(form_type, output_format)
+        template = self._compiled.get(name)
+        if template is not None:
+            self.hits += 1
+            return template
+        with self._lock:
+            template = self._compiled.get(name)
+            if template is None:
+                if name not in self._sources:
+                    raise ValueError(f"No template registered for {form_type} in format: {output_format.value}")
+                template = self.environment.get_template(name)
+                self._compiled[name] = template
+                self.misses += 1
+            else:
+                self.hits += 1
+        return template
+
+    def compile_all(self):
+        """Compile every registered template, e.g. before forking workers."""
+        for name in list(self._sources):
+            with self._lock:
+                if name not in self._compiled:
+                    self._compiled[name] = self.environment.get_template(name)
+                    self.misses += 1
+
+    def stats(self) -> dict:
+        return {
+            'templates': len(self._compiled),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+template_registry = TemplateRegistry(Config.TEMPLATE_BYTECODE_CACHE)
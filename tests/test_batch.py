@@ -0,0 +1,28 @@
+import batch
+from batch import BatchRenderer, _prepare_rows, _render_pool
+from config import FormType
+from document_generator import OutputFormat
+from tests.test_docx_stream import sample_form_data
+
+
+def rows(count: int) -> list:
+    return [{name: str(value) for name, value in sample_form_data(plot_number=f"P-{number}").items()}
+            for number in range(count)]
+
+
+def render(workers: int) -> list:
+    renderer = BatchRenderer(FormType.DHA_LICENSE_A, OutputFormat.DOCX.value, workers=workers, chunk_size=2)
+    return list(renderer.map(_prepare_rows(FormType.DHA_LICENSE_A, rows(6))))
+
+
+def test_render_processes_match_in_process_rendering():
+    results = render(2)
+    assert all(error is None for *_, error in results)
+    assert results == render(1)
+
+
+def test_pools_are_kept_by_size():
+    assert _render_pool(2) is _render_pool(2)
+    assert _render_pool(3) is not _render_pool(2)
+    assert _render_pool(3)._max_workers == 3
+    assert _render_pool(2)._mp_context.get_start_method() == batch.RENDER_START_METHOD
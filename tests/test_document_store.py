@@ -0,0 +1,48 @@
+import pytest
+
+import app as app_module
+from config import FormType
+from document_cache import document_cache
+from document_generator import DocumentGeneratorFactory, OutputFormat
+from document_store import DocumentStore, TemplateChangedError
+from tests.test_docx_stream import sample_form_data
+
+RENDERED_AGAIN = [OutputFormat.DOCX, OutputFormat.PDF]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return DocumentStore(str(tmp_path / 'store'), str(tmp_path / 'documents.sqlite3'), archive=True, compress=False)
+
+
+def keep(store: DocumentStore, output_format: OutputFormat):
+    form_data = sample_form_data()
+    generator = DocumentGeneratorFactory.create_generator(FormType.DHA_LICENSE_A, form_data, output_format.value)
+    content = generator.to_bytes()
+    document_id = store.keep(FormType.DHA_LICENSE_A, form_data, output_format, generator.extension, content)
+    return store.get(document_id), content
+
+
+@pytest.mark.parametrize('output_format', RENDERED_AGAIN)
+def test_archived_documents_render_as_issued(archive, output_format):
+    document, content = keep(archive, output_format)
+    assert archive.load(document) == content
+    assert archive.load(document) == content
+
+
+@pytest.mark.parametrize('output_format', RENDERED_AGAIN)
+def test_unchanged_download_is_not_modified(archive, monkeypatch, output_format):
+    monkeypatch.setattr(app_module, 'document_store', archive)
+    document, _ = keep(archive, output_format)
+    client = app_module.app.test_client()
+    etag = client.get(f"/documents/{document['id']}").headers['ETag']
+    assert client.get(f"/documents/{document['id']}", headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_changed_templates_are_refused(archive, monkeypatch):
+    document, _ = keep(archive, OutputFormat.PDF)
+    monkeypatch.setattr(document_cache, 'template_version', lambda form_type: 'changed')
+    with pytest.raises(TemplateChangedError):
+        archive.load(document)
+    monkeypatch.setattr(app_module, 'document_store', archive)
+    assert app_module.app.test_client().get(f"/documents/{document['id']}").status_code == 409
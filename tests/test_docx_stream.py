@@ -0,0 +1,64 @@
+import io
+import zipfile
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from docx import Document
+
+from config import Config, FormType
+from docx_generator import DocxGenerator, DocxStreamGenerator
+
+
+def sample_form_data(**changes) -> dict:
+    form_data = dict(Config.DEFAULT_VALUES[FormType.DHA_LICENSE_A])
+    form_data.update(
+        kpt_book_date=date(2024, 1, 15),
+        kpt_mf_roll_date=date(2024, 2, 20),
+        transfer_order_date=date(2024, 3, 25),
+        premium_rate=Decimal('5000'),
+        ground_rent_rate=Decimal('50')
+    )
+    form_data.update(changes)
+    return form_data
+
+
+def render_both(form_data: dict):
+    """The python-docx and streamed DOCX files for the same form data and context"""
+    generator = DocxGenerator(form_data)
+    stream_generator = DocxStreamGenerator(form_data, context=generator.context)
+    return generator.to_bytes(), stream_generator.to_bytes()
+
+
+def parts(content: bytes) -> dict:
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def paragraph_texts(content: bytes) -> list:
+    return [paragraph.text for paragraph in Document(io.BytesIO(content)).paragraphs]
+
+
+CASES = {
+    'defaults': {},
+    'markup': {'licensee_name': 'Ahmed & Sons <Pvt> "Ltd"'},
+    'spaces_and_tabs': {'plot_number': '  A-12\t', 'deh': 'Deh\tPhase 6 '},
+    'crlf': {'licensee_address': 'House 1\r\nStreet 2\r\nKarachi'},
+    'control_characters': {'licensee_name': 'Muhammad\x01 Ahmed\x0b', 'witness1_name': '\x00Ali\x1f'},
+    'non_ascii': {'licensee_name': 'محمد احمد', 'police_station': 'Café ☕'}
+}
+
+
+@pytest.mark.parametrize('changes', CASES.values(), ids=CASES.keys())
+def test_stream_backend_writes_the_same_document(changes):
+    docx_content, stream_content = render_both(sample_form_data(**changes))
+    docx_parts, stream_parts = parts(docx_content), parts(stream_content)
+    assert stream_parts.keys() == docx_parts.keys()
+    for name, data in docx_parts.items():
+        assert stream_parts[name] == data, name
+    assert paragraph_texts(stream_content) == paragraph_texts(docx_content)
+
+
+def test_control_characters_are_dropped():
+    _, stream_content = render_both(sample_form_data(licensee_name='Muhammad\x01 Ahmed'))
+    assert any('Muhammad Ahmed' in text for text in paragraph_texts(stream_content))
@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+import pytest
+
+from config import Config, FormType
+from document_generator import DocumentGeneratorFactory, OutputFormat
+from fees import LUMP_SUM, fee_context, instalment_schedule
+from tests.test_docx_stream import paragraph_texts, sample_form_data
+
+FOUR_INSTALMENTS = ('in 4 instalments, the first of Rs.6,25,000.00 (rupees six lakh twenty five thousand only) '
+                    'before execution of this licence agreement and the remaining 3 of Rs.6,25,000.00 '
+                    '(rupees six lakh twenty five thousand only) each as called by the 1st Party')
+
+
+def test_instalments_add_up_to_the_total():
+    schedule = instalment_schedule(Decimal('1000.00'), 3)
+    assert schedule == [Decimal('333.34'), Decimal('333.33'), Decimal('333.33')]
+    assert sum(schedule) == Decimal('1000.00')
+
+
+@pytest.mark.parametrize('count', [0, -2])
+def test_instalment_count_below_one(count):
+    with pytest.raises(ValueError):
+        instalment_schedule(Decimal('1000.00'), count)
+
+
+def test_premium_terms():
+    assert fee_context(sample_form_data())['premium_terms'] == LUMP_SUM
+    assert fee_context(sample_form_data(), 4)['premium_terms'] == FOUR_INSTALMENTS
+    # Without a usable total the schedule is stated without amounts
+    terms = fee_context(sample_form_data(plot_area='unknown'), 4)['premium_terms']
+    assert terms == 'in 4 instalments, the first before execution of this licence agreement'
+
+
+def document_text(output_format: OutputFormat) -> str:
+    generator = DocumentGeneratorFactory.create_generator(FormType.DHA_LICENSE_A, sample_form_data(), output_format.value)
+    if output_format == OutputFormat.DOCX:
+        return '\n'.join(paragraph_texts(generator.to_bytes()))
+    if output_format == OutputFormat.PDF:
+        return '\n'.join(getattr(flowable, 'text', '') for flowable in generator.generate())
+    return generator.to_bytes().decode('utf-8')
+
+
+@pytest.mark.parametrize('output_format', list(OutputFormat))
+def test_schedule_is_rendered(monkeypatch, output_format):
+    monkeypatch.setattr(Config, 'PREMIUM_INSTALMENTS', 4)
+    assert FOUR_INSTALMENTS in document_text(output_format)
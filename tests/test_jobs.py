@@ -0,0 +1,19 @@
+import pytest
+
+from app import app
+from tests.test_docx_stream import sample_form_data
+
+FORM_DATA = {name: str(value) for name, value in sample_form_data().items()}
+
+
+@pytest.mark.parametrize('body', [
+    {'form_data': FORM_DATA, 'output_format': 5},
+    {'form_data': FORM_DATA, 'output_format': None},
+    {'form_data': FORM_DATA, 'form_type': ['DHA_LICENSE_A']},
+    {'form_data': FORM_DATA, 'form_type': {'name': 'DHA_LICENSE_A'}},
+    [FORM_DATA],
+])
+def test_malformed_job_requests_are_refused(body):
+    response = app.test_client().post('/jobs', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
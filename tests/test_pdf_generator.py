@@ -0,0 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from config import FormType
+from pdf_generator import PDFGenerator
+from tests.test_docx_stream import sample_form_data
+
+RENDERS = 200
+THREADS = 4
+
+
+def render_pdf(form_data: dict) -> bytes:
+    return PDFGenerator(form_data, FormType.DHA_LICENSE_A).to_bytes()
+
+
+def test_concurrent_renders_do_not_share_flowables():
+    form_data = sample_form_data()
+    render_pdf(form_data)  # Fill the static block cache before the threads start
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        documents = list(executor.map(render_pdf, [form_data] * RENDERS))
+    assert all(document.startswith(b'%PDF') and document.rstrip().endswith(b'%%EOF') for document in documents)
+
+
+def test_static_paragraph_split_across_pages():
+    # A long plot area pushes the static clause (vi) over the page 2 boundary
+    form_data = sample_form_data(plot_area=' '.join(['word'] * 600))
+    assert render_pdf(form_data).startswith(b'%PDF')
@@ -0,0 +1,33 @@
+import pytest
+
+from app import app
+from config import FormType
+from schema import NOT_SCALAR, validate
+from tests.test_docx_stream import sample_form_data
+
+FORM_DATA = {name: str(value) for name, value in sample_form_data().items()}
+
+
+def test_sample_form_data_is_valid():
+    form_data, errors = validate(FormType.DHA_LICENSE_A, FORM_DATA)
+    assert errors == {}
+    assert form_data['licensee_name'] == FORM_DATA['licensee_name']
+
+
+@pytest.mark.parametrize('name, value', [
+    ('licensee_name', {'first': 'Ahmed'}),
+    ('licensee_address', ['House 1', 'Karachi']),
+    ('kpt_book_date', {'year': 2024}),
+    ('premium_rate', [5000]),
+])
+def test_lists_and_objects_are_refused(name, value):
+    form_data, errors = validate(FormType.DHA_LICENSE_A, dict(FORM_DATA, **{name: value}))
+    assert form_data is None
+    assert errors == {name: [NOT_SCALAR]}
+
+
+def test_api_refuses_objects_for_string_fields():
+    response = app.test_client().post('/api/DHA_LICENSE_A',
+                                      json={'form_data': dict(FORM_DATA, licensee_name={'first': 'Ahmed'})})
+    assert response.status_code == 400
+    assert response.get_json()['fields'] == {'licensee_name': [NOT_SCALAR]}
@@ -0,0 +1,123 @@
+import struct
+import zlib
+
+# Fixed timestamp for entries (1980-01-01 00:00) so identical content produces identical archives
+DOS_TIME = 0
+DOS_DATE = (0 << 9) | (1 << 5) | 1
+
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+DATA_DESCRIPTOR = struct.Struct('<4s3L')
+CENTRAL_HEADER = struct.Struct('<4s6H3L5H2L')
+END_RECORD = struct.Struct('<4s4H2LH')
+ZIP64_EXTRA = struct.Struct('<2H')
+ZIP64_END_RECORD = struct.Struct('<4sQ2H2L4Q')
+ZIP64_END_LOCATOR = struct.Struct('<4sLQL')
+
+# Beyond these, sizes, offsets and the entry count are written in ZIP64 records
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+VERSION = 20
+ZIP64_VERSION = 45
+
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+DEFLATED = 8
+
+
+def deflate(data: bytes) -> tuple:
+    """Compress ``data`` once for repeated use with ``ZipStreamWriter.write_deflated``.
+
+    Returns ``(compressed, crc, size)``.
+    """
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data)
+
+
+class ZipStreamWriter:
+    """Write a ZIP archive sequentially to a stream that need not be seekable.
+
+    Entries whose content is known up front carry their sizes in the local
+    header; streamed entries are followed by a data descriptor. Archives
+    past 4 GB or 65,535 entries get ZIP64 records in the central directory,
+    so a batch of any size can be written; a single entry is limited to
+    4 GB. The result reads back with ``zipfile`` and opens in Word.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._offset = 0
+        self._entries = []
+
+    def _write(self, data: bytes):
+        self._stream.write(data)
+        self._offset += len(data)
+
+    def _local_header(self, name: bytes, flags: int, crc: int, compressed_size: int, size: int):
+        self._entries.append((name, flags, crc, compressed_size, size, self._offset))
+        self._write(LOCAL_HEADER.pack(b'PK\x03\x04', VERSION, flags, DEFLATED, DOS_TIME, DOS_DATE,
+                                      crc, compressed_size, size, len(name), 0))
+        self._write(name)
+
+    def write_deflated(self, name: str, compressed: bytes, crc: int, size: int):
+        """Add an entry from the output of ``deflate``, without compressing it again"""
+        if size >= ZIP64_LIMIT or len(compressed) >= ZIP64_LIMIT:
+            raise ValueError(f"Entry {name} is too large for a ZIP archive entry (4 GB)")
+        self._local_header(name.encode('utf-8'), FLAG_UTF8, crc, len(compressed), size)
+        self._write(compressed)
+
+    def writestr(self, name: str, data: bytes):
+        self.write_deflated(name, *deflate(data))
+
+    def write_stream(self, name: str, chunks):
+        """Add an entry from an iterable of byte chunks, compressing as they arrive"""
+        encoded_name = name.encode('utf-8')
+        flags = FLAG_UTF8 | FLAG_DATA_DESCRIPTOR
+        self._local_header(encoded_name, flags, 0, 0, 0)
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        crc = size = compressed_size = 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            compressed = compressor.compress(chunk)
+            if compressed:
+                compressed_size += len(compressed)
+                self._write(compressed)
+        compressed = compressor.flush()
+        compressed_size += len(compressed)
+        self._write(compressed)
+        if size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT:
+            raise ValueError(f"Entry {name} is too large for a ZIP archive entry (4 GB)")
+        self._write(DATA_DESCRIPTOR.pack(b'PK\x07\x08', crc, compressed_size, size))
+        self._entries[-1] = (encoded_name, flags, crc, compressed_size, size, self._entries[-1][5])
+
+    def close(self):
+        """Write the central directory; the stream itself is left open"""
+        start = self._offset
+        for name, flags, crc, compressed_size, size, offset in self._entries:
+            extra = b''
+            version = VERSION
+            if offset >= ZIP64_LIMIT:
+                # Entries are limited to 4 GB, so only the local header's offset can need ZIP64
+                extra = ZIP64_EXTRA.pack(0x0001, 8) + struct.pack('<Q', offset)
+                offset = ZIP64_LIMIT
+                version = ZIP64_VERSION
+            self._write(CENTRAL_HEADER.pack(b'PK\x01\x02', version, version, flags, DEFLATED, DOS_TIME, DOS_DATE,
+                                            crc, compressed_size, size, len(name), len(extra), 0, 0, 0, 0, offset))
+            self._write(name)
+            self._write(extra)
+        count, directory_size = len(self._entries), self._offset - start
+        if count > ZIP64_COUNT_LIMIT or directory_size >= ZIP64_LIMIT or start >= ZIP64_LIMIT:
+            end_offset = self._offset
+            self._write(ZIP64_END_RECORD.pack(b'PK\x06\x06', ZIP64_END_RECORD.size - 12, ZIP64_VERSION,
+                                              ZIP64_VERSION, 0, 0, count, count, directory_size, start))
+            self._write(ZIP64_END_LOCATOR.pack(b'PK\x06\x07', 0, end_offset, 1))
+            count = min(count, ZIP64_COUNT_LIMIT)
+            directory_size, start = min(directory_size, ZIP64_LIMIT), min(start, ZIP64_LIMIT)
+        self._write(END_RECORD.pack(b'PK\x05\x06', 0, 0, count, count, directory_size, start, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()